@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the garminconnect client against a local stand-in for Garmin Connect
+
+    python -m benchmarks.run
+"""
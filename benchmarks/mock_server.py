@@ -0,0 +1,490 @@
+"""
+Local stand-in for the Garmin Connect SSO and proxy endpoints used by garminconnect.Garmin
+"""
+
+import datetime
+import hashlib
+import io
+import json
+import random
+import re
+import socket
+import struct
+import threading
+import time
+import zipfile
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+DISPLAY_NAME = "benchmark-user"
+
+# Longest span the range endpoints answer, longer ones get a 400
+RANGE_LIMIT_DAYS = 365
+
+USER_PREFERENCES = {"displayName": DISPLAY_NAME, "measurementSystem": "metric"}
+SOCIAL_PROFILE = {"displayName": DISPLAY_NAME, "fullName": "Benchmark User"}
+
+
+def _day_start_ms(cdate):
+    day = datetime.datetime.strptime(cdate, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+    return int(day.timestamp() * 1000)
+
+
+def _series(cdate, step_seconds, low, high, seed):
+    rng = random.Random(f"{cdate}-{seed}")
+    start = _day_start_ms(cdate)
+    return [[start + index * step_seconds * 1000, rng.randint(low, high)] for index in range(86400 // step_seconds)]
+
+
+def user_summary(cdate):
+    rng = random.Random(cdate)
+    summary = {
+        "userProfileId": 1,
+        "calendarDate": cdate,
+        "privacyProtected": False,
+        "totalSteps": rng.randint(2000, 20000),
+        "totalDistanceMeters": rng.randint(1000, 15000),
+        "restingHeartRate": rng.randint(40, 70),
+    }
+    # Pad with the long tail of counters the real summary carries (~3 KB)
+    summary.update({f"metric{index}": rng.random() * 1000 for index in range(120)})
+    return summary
+
+
+def heart_rate(cdate):
+    return {
+        "userProfileId": 1,
+        "calendarDate": cdate,
+        "restingHeartRate": 52,
+        "heartRateValueDescriptors": [{"key": "timestamp", "index": 0}, {"key": "heartrate", "index": 1}],
+        "heartRateValues": _series(cdate, 120, 45, 170, "hr"),
+    }
+
+
+def sleep_data(cdate):
+    start = _day_start_ms(cdate)
+    return {
+        "dailySleepDTO": {"calendarDate": cdate, "sleepTimeSeconds": 27000, "deepSleepSeconds": 5400},
+        "sleepMovement": [
+            {"startGMT": start + index * 60000, "endGMT": start + (index + 1) * 60000, "activityLevel": 0.5}
+            for index in range(540)
+        ],
+        "sleepLevels": [
+            {"startGMT": start + index * 900000, "endGMT": start + (index + 1) * 900000, "activityLevel": index % 3}
+            for index in range(36)
+        ],
+    }
+
+
+def steps_data(cdate):
+    start = _day_start_ms(cdate)
+    return [
+        {"startGMT": start + index * 900000, "endGMT": start + (index + 1) * 900000, "steps": index * 7 % 300,
+         "primaryActivityLevel": "active"}
+        for index in range(96)
+    ]
+
+
+def stress_data(cdate):
+    return {"calendarDate": cdate, "stressValuesArray": _series(cdate, 180, -1, 100, "stress"),
+            "bodyBatteryValuesArray": [[ts, "MEASURED", value, 1.0] for ts, value in _series(cdate, 180, 5, 100, "bb")]}
+
+
+def respiration_data(cdate):
+    return {"calendarDate": cdate, "respirationValuesArray": _series(cdate, 120, 10, 22, "resp")}
+
+
+def spo2_data(cdate):
+    return {"calendarDate": cdate, "spO2HourlyAverages": _series(cdate, 3600, 88, 100, "spo2")}
+
+
+def activity(index):
+    start = datetime.datetime(2021, 1, 1) + datetime.timedelta(hours=6 * index)
+    entry = {
+        "activityId": 5000000000 + index,
+        "activityName": f"Activity {index}",
+        "startTimeLocal": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "startTimeGMT": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "activityType": {"typeId": 1, "typeKey": "running", "parentTypeId": 17},
+        "distance": 10000.0 + index,
+        "duration": 3000.0,
+        "averageHR": 150.0,
+    }
+    entry.update({f"field{field}": field * 1.5 for field in range(60)})
+    return entry
+
+
+def fit_activity(seconds, start=datetime.datetime(2021, 1, 1, 6, 0), seed=0):
+    """
+    Return a zipped FIT file with one record message per second, as an ORIGINAL download.
+    Every tenth record uses a compressed timestamp header and every hundredth has no heart rate.
+    """
+
+    rng = random.Random(seed)
+    fit_start = int(start.replace(tzinfo=datetime.timezone.utc).timestamp()) - 631065600
+    fields = ((253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (78, 4, 0x86), (3, 1, 0x02), (4, 1, 0x02),
+              (5, 4, 0x86), (73, 4, 0x86), (7, 2, 0x84))
+
+    def definition(local, global_num, fields):
+        header = struct.pack("<BBBHB", 0x40 | local, 0, 0, global_num, len(fields))
+        return header + b"".join(struct.pack("<BBB", *field) for field in fields)
+
+    data = [definition(0, 0, ((0, 1, 0x00), (4, 4, 0x86))), struct.pack("<BBI", 0, 4, fit_start),
+            definition(1, 20, fields), definition(2, 20, fields[1:])]
+    lat, lon = 52.0 * 2 ** 31 / 180, 21.0 * 2 ** 31 / 180
+    for second in range(seconds):
+        lat += rng.uniform(-50, 50)
+        lon += rng.uniform(-50, 50)
+        heart_rate = 0xFF if second % 100 == 99 else 120 + second % 50
+        values = (int(lat), int(lon), int((100 + second % 30 + 500) * 5), heart_rate, 85, second * 300,
+                  3000 + second % 500, 200 + second % 100)
+        timestamp = fit_start + second
+        if second % 10 == 5:
+            data.append(struct.pack("<B", 0x80 | (2 << 5) | (timestamp & 0x1F)) +
+                        struct.pack("<iiIBBIIH", *values))
+        else:
+            data.append(struct.pack("<BIiiIBBIIH", 1, timestamp, *values))
+
+    body = b"".join(data)
+    fit = struct.pack("<BBHI4sH", 14, 0x20, 2132, len(body), b".FIT", 0) + body + b"\0\0"
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zipped:
+        zipped.writestr("activity.fit", fit)
+
+    return archive.getvalue()
+
+
+def tcx_activity(seconds, start=datetime.datetime(2021, 1, 1, 6, 0)):
+    """
+    Return a TCX export with one trackpoint per second
+    """
+
+    points = []
+    for second in range(seconds):
+        time = (start + datetime.timedelta(seconds=second)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        points.append(
+            f"<Trackpoint><Time>{time}</Time>"
+            f"<Position><LatitudeDegrees>{52 + second * 1e-5:.7f}</LatitudeDegrees>"
+            f"<LongitudeDegrees>{21 + second * 1e-5:.7f}</LongitudeDegrees></Position>"
+            f"<AltitudeMeters>{100 + second % 30}.0</AltitudeMeters><DistanceMeters>{second * 3}.0</DistanceMeters>"
+            f"<HeartRateBpm><Value>{120 + second % 50}</Value></HeartRateBpm><Cadence>85</Cadence>"
+            f"<Extensions><TPX xmlns=\"http://www.garmin.com/xmlschemas/ActivityExtension/v2\">"
+            f"<Speed>{3 + second % 500 / 1000}</Speed><Watts>{200 + second % 100}</Watts></TPX></Extensions>"
+            f"</Trackpoint>\n"
+        )
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">'
+        f'<Activities><Activity Sport="Running"><Id>{start.isoformat()}Z</Id><Lap><Track>\n'
+        + "".join(points)
+        + "</Track></Lap></Activity></Activities></TrainingCenterDatabase>\n"
+    ).encode()
+
+
+def activity_details(activity_id, max_chart, max_poly, seconds=3000):
+    """
+    Details payload of a per-second activity, downsampled to 'max_chart' samples and 'max_poly' points
+    """
+
+    start = _day_start_ms("2021-01-01")
+    keys = ("directTimestamp", "directHeartRate", "directSpeed", "directElevation", "sumDistance")
+    samples = [second * seconds // min(max_chart, seconds) for second in range(min(max_chart, seconds))]
+    points = [second * seconds // min(max_poly, seconds) for second in range(min(max_poly, seconds))]
+
+    return {
+        "activityId": activity_id,
+        "measurementCount": len(keys),
+        "metricsCount": len(samples),
+        "metricDescriptors": [{"metricsIndex": index, "key": key} for index, key in enumerate(keys)],
+        "activityDetailMetrics": [
+            {"metrics": [start + second * 1000, None if second % 100 == 99 else 120 + second % 50,
+                         3.0 + second % 500 / 1000, 100.0 + second % 30, second * 3.0]}
+            for second in samples
+        ],
+        "geoPolylineDTO": {"polyline": [
+            {"time": start + second * 1000, "lat": 52 + second * 1e-5, "lon": 21 + second * 1e-5,
+             "altitude": 100.0 + second % 30, "speed": 3.0, "valid": True}
+            for second in points
+        ]},
+    }
+
+
+def _days(start, end):
+    day = datetime.date.fromisoformat(start)
+    last = datetime.date.fromisoformat(end)
+    while day <= last:
+        yield day.isoformat()
+        day += datetime.timedelta(days=1)
+
+
+def rhr_range(start, end):
+    values = [{"value": float(random.Random(f"{day}-rhr").randint(42, 60)), "calendarDate": day}
+              for day in _days(start, end)]
+    return {"userProfileId": 1, "statisticsStartDate": start, "statisticsEndDate": end,
+            "allMetrics": {"metricsMap": {"WELLNESS_RESTING_HEART_RATE": values}}, "groupedMetrics": None}
+
+
+def max_metrics_range(start, end):
+    return [{"userId": 1, "generic": {"calendarDate": day, "vo2MaxValue": 50.0, "fitnessAge": 30}, "cycling": None}
+            for day in _days(start, end)]
+
+
+def body_composition_range(start, end):
+    # A weigh-in every third day
+    entries = [{"calendarDate": day, "date": _day_start_ms(day), "weight": 72000.0 + _day_start_ms(day) % 7 * 100,
+                "bmi": 22.4, "bodyFat": None}
+               for day in _days(start, end) if datetime.date.fromisoformat(day).toordinal() % 3 == 0]
+    weights = [entry["weight"] for entry in entries]
+    return {"startDate": start, "endDate": end, "dateWeightList": entries,
+            "totalAverage": {"from": _day_start_ms(start), "until": _day_start_ms(end) + 86399999,
+                             "weight": sum(weights) / len(weights) if weights else None,
+                             "bmi": 22.4 if entries else None, "bodyFat": None}}
+
+
+class MockGarminServer:
+    """
+    Threaded HTTP server answering the SSO login flow and the proxy endpoints Garmin uses.
+
+    'latency' (seconds) and 'jitter' are added to every response; a 'throttle_rate' fraction
+    of proxy requests is answered with 429 and 'Retry-After: 0'. With 'session_requests' proxy
+    requests need the cookie set by the last login and get 401 once it served that many requests.
+    JSON responses carry an ETag and a matching If-None-Match is answered with 304.
+    """
+
+    def __init__(self, latency=0.02, jitter=0.005, throttle_rate=0.0, activities=500,
+                 download_size=512 * 1024, seed=0, session_requests=None, devices=3):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.session_requests = session_requests
+        self.devices = devices
+        self.activities = [activity(index) for index in reversed(range(activities))]
+        self.download = bytes(random.Random(seed).getrandbits(8) for _ in range(4096)) * (download_size // 4096)
+        self.requests = 0
+        self.throttled = 0
+        self.logins = 0
+        self.unauthorized = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+
+        self._session_id = None
+        self._session_served = 0
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+
+    @property
+    def address(self):
+        host, port = self._server.server_address
+        return f"{host}:{port}"
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+    def point_client(self, garmin):
+        """
+        Redirect a garminconnect.Garmin instance to this server
+        """
+
+        for client, path in ((garmin.sso_rest_client, "sso"), (garmin.modern_rest_client, "modern")):
+            client.scheme = "http"
+            client.base_url = f"{self.address}/{path}"
+        garmin.garmin_connect_base_url = f"http://{self.address}"
+        garmin.garmin_connect_login_url = f"http://{self.address}/en-US/signin"
+
+
+    def _delay(self):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            throttle = self._rng.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+        time.sleep(delay)
+        return throttle
+
+
+    def _login(self):
+        """
+        Start a new session, returning its cookie value
+        """
+
+        with self._lock:
+            self.logins += 1
+            self._session_id = f"session-{self.logins}"
+            self._session_served = 0
+            return self._session_id
+
+
+    def _authorized(self, cookie_header):
+        if self.session_requests is None:
+            return True
+
+        cookies = dict(part.strip().split("=", 1) for part in (cookie_header or "").split(";") if "=" in part)
+        with self._lock:
+            if cookies.get("SESSIONID") == self._session_id and self._session_served < self.session_requests:
+                self._session_served += 1
+                return True
+            self.unauthorized += 1
+            return False
+
+
+    def _route(self, method, path, query):
+        """
+        Return (status, content type, body bytes)
+        """
+
+        if path == "/sso/signin" and method == "GET":
+            return 200, "text/html", b'<form><input type="hidden" name="_csrf" value="benchmarkcsrf0001"/></form>'
+        if path == "/sso/signin" and method == "POST":
+            return 200, "text/html", b'<script>var response_url = "http://localhost/modern?ticket=ST-0000001-benchmark";</script>'
+        if path in ("/sso/login", "/modern", "/modern/"):
+            page = (
+                f"<script>window.VIEWER_USERPREFERENCES = {json.dumps(USER_PREFERENCES)};\n"
+                f"window.VIEWER_SOCIAL_PROFILE = {json.dumps(SOCIAL_PROFILE)};</script>"
+            )
+            return 200, "text/html", page.encode()
+
+        if not path.startswith("/modern/proxy/"):
+            return 404, "text/plain", b"not found"
+        path = path[len("/modern/proxy/"):]
+
+        if path.startswith("download-service/"):
+            return 200, "application/octet-stream", self.download
+
+        found = re.match(r"(?:weight-service/weight/dateRange|userstats-service/wellness/daily/[^/]+"
+                         r"|metrics-service/metrics/maxmet/daily/(\d{4}-\d{2}-\d{2})/(\d{4}-\d{2}-\d{2}))$", path)
+        if found:
+            start = found.group(1) or (query.get("startDate") or query.get("fromDate"))[0]
+            end = found.group(2) or (query.get("endDate") or query.get("untilDate"))[0]
+            if (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days >= RANGE_LIMIT_DAYS:
+                return 400, "text/plain", b"Date range too long"
+            if path.startswith("weight-service/"):
+                data = body_composition_range(start, end)
+            elif path.startswith("userstats-service/"):
+                data = rhr_range(start, end)
+            else:
+                data = max_metrics_range(start, end)
+            return 200, "application/json", json.dumps(data).encode()
+
+        cdate = (query.get("calendarDate") or query.get("date") or query.get("fromDate") or [None])[0]
+        found = re.search(r"\d{4}-\d{2}-\d{2}", path)
+        if cdate is None and found:
+            cdate = found.group(0)
+
+        if path.startswith("activitylist-service/"):
+            start = int(query.get("start", ["0"])[0])
+            limit = int(query.get("limit", ["20"])[0])
+            data = self.activities[start:start + limit]
+        elif path.startswith("usersummary-service/usersummary/daily/"):
+            data = user_summary(cdate)
+        elif path.startswith("wellness-service/wellness/dailyHeartRate/"):
+            data = heart_rate(cdate)
+        elif path.startswith("wellness-service/wellness/dailySleepData/"):
+            data = sleep_data(cdate)
+        elif path.startswith("wellness-service/wellness/dailySummaryChart/"):
+            data = steps_data(cdate)
+        elif path.startswith("wellness-service/wellness/dailyStress/"):
+            data = stress_data(cdate or "2021-01-01")
+        elif path.startswith("wellness-service/wellness/daily/respiration/"):
+            data = respiration_data(cdate)
+        elif path.startswith("wellness-service/wellness/daily/spo2/"):
+            data = spo2_data(cdate)
+        elif re.match(r"activity-service/activity/\d+/details$", path):
+            data = activity_details(int(path.split("/")[2]), int(query.get("maxChartSize", ["2000"])[0]),
+                                    int(query.get("maxPolylineSize", ["4000"])[0]))
+        elif re.match(r"activity-service/activity/\d+$", path):
+            data = {"activityId": int(path.split("/")[2]), "summaryDTO": {"elapsedDuration": 3000.0}}
+        elif path.startswith("device-service/deviceregistration/devices"):
+            data = [{"deviceId": 3000000000 + index, "productDisplayName": f"Watch {index}"} for index in range(self.devices)]
+        elif path.startswith("device-service/deviceservice/device-info/settings/"):
+            data = {"deviceId": int(path.rsplit("/", 1)[1]), "alarms": [{"alarmTime": 420, "alarmMode": "ON"}]}
+        else:
+            data = {"calendarDate": cdate}
+
+        return 200, "application/json", json.dumps(data).encode()
+
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body are written separately, avoid Nagle + delayed ACK stalls
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                proxy = parts.path.startswith("/modern/proxy/")
+                throttle = server._delay()
+                if throttle and proxy:
+                    status, content_type, body = 429, "text/plain", b"Too Many Requests"
+                elif proxy and not server._authorized(self.headers.get("Cookie")):
+                    status, content_type, body = 401, "text/plain", b"Unauthorized"
+                else:
+                    status, content_type, body = server._route(method, parts.path, query)
+
+                etag = None
+                if status == 200 and content_type == "application/json":
+                    etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        status, body = 304, b""
+                        with server._lock:
+                            server.not_modified += 1
+                with server._lock:
+                    server.bytes_sent += len(body)
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if parts.path in ("/modern", "/modern/") and "ticket" in query:
+                    self.send_header("Set-Cookie", f"SESSIONID={server._login()}; Path=/")
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+        return Handler
@@ -0,0 +1,241 @@
+"""
+End-to-end client benchmarks against the local mock server
+
+    python -m benchmarks.run [--latency 0.02] [--jitter 0.005] [--throttle-rate 0.0] [--days 60] [--workers 8]
+"""
+
+import argparse
+import datetime
+import shutil
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from garminconnect import Garmin, MetricsRegistry, RateLimiter, ResponseCache, fit, xmltrack
+
+from .mock_server import MockGarminServer, fit_activity, tcx_activity
+
+
+def _client(server, **kwargs):
+    garmin = Garmin("benchmark@example.com", "password", **kwargs)
+    server.point_client(garmin)
+    return garmin
+
+
+def _logged_in(server, **kwargs):
+    garmin = _client(server, **kwargs)
+    if not garmin.login():
+        raise RuntimeError("Login against the mock server failed.")
+    return garmin
+
+
+def bench_login(server, args):
+    rounds = 5
+    for _ in range(rounds):
+        _logged_in(server, **args.client_kwargs)
+    return rounds, "logins"
+
+
+def bench_backfill_sequential(server, args):
+    garmin = _logged_in(server, **args.client_kwargs)
+    start = datetime.date(2021, 1, 1)
+    for offset in range(args.days):
+        garmin.get_heart_rate((start + datetime.timedelta(days=offset)).isoformat())
+    return args.days, "days"
+
+
+def bench_backfill_range(server, args):
+    garmin = _logged_in(server, **args.client_kwargs)
+    end = datetime.date(2021, 1, 1) + datetime.timedelta(days=args.days - 1)
+    results = list(garmin.get_range("heart_rate", "2021-01-01", end, max_workers=args.workers))
+    failed = sum(result.error is not None for result in results)
+    if failed:
+        raise RuntimeError(f"{failed} days failed.")
+    return len(results), "days"
+
+
+def bench_pagination(server, args, prefetch):
+    garmin = _logged_in(server, **args.client_kwargs)
+    count = sum(1 for _ in garmin.iter_activities(None, None, prefetch=prefetch))
+    return count, "activities"
+
+
+def bench_downloads(server, args):
+    garmin = _logged_in(server, **args.client_kwargs)
+    ids = [activity["activityId"] for activity in server.activities[:args.downloads]]
+    dest_dir = tempfile.mkdtemp(prefix="garminconnect-bench-")
+    try:
+        results = garmin.download_activities(ids, Garmin.ActivityDownloadFormat.ORIGINAL, dest_dir,
+                                             max_workers=args.workers)
+    finally:
+        shutil.rmtree(dest_dir)
+    failed = sum(result.error is not None for result in results)
+    if failed:
+        raise RuntimeError(f"{failed} downloads failed.")
+    return len(results), "files"
+
+
+def bench_shared_client(server, args):
+    """
+    One client shared by 'shared_threads' threads while the server expires its session
+    every 'session_requests' requests
+    """
+
+    garmin = _logged_in(server, pool_maxsize=args.shared_threads, **args.client_kwargs)
+    start = datetime.date(2021, 1, 1)
+    days = [(start + datetime.timedelta(days=offset)).isoformat() for offset in range(args.days * 4)]
+
+    server.session_requests = args.session_requests
+    logins = server.logins
+    try:
+        with ThreadPoolExecutor(max_workers=args.shared_threads) as executor:
+            results = list(executor.map(garmin.get_user_summary, days))
+    finally:
+        server.session_requests = None
+    if len(results) != len(days):
+        raise RuntimeError(f"{len(days) - len(results)} days failed.")
+    return len(results), f"days, {server.logins - logins} logins"
+
+
+def bench_device_polling(server, args, cache):
+    """
+    Poll the device list and settings, with or without ETag revalidation through a ResponseCache
+    """
+
+    garmin = _logged_in(server, cache=ResponseCache() if cache else None, **args.client_kwargs)
+    sent, not_modified = server.bytes_sent, server.not_modified
+    rounds = 50
+    for _ in range(rounds):
+        for device in garmin.get_devices():
+            garmin.get_device_settings(device["deviceId"])
+    return rounds, f"polls, {(server.bytes_sent - sent) / 1024:.0f} KB sent, {server.not_modified - not_modified} 304s"
+
+
+def bench_device_alarms(server, args, max_workers):
+    garmin = _logged_in(server, **args.client_kwargs)
+    server.devices = args.devices
+    try:
+        alarms = garmin.get_device_alarms(max_workers=max_workers)
+    finally:
+        server.devices = 3
+    return len(alarms), "alarms"
+
+
+def bench_day_view(server, args, bundle):
+    """
+    Fetch every section of a day view for 'days' days, one request after another or with get_day_bundle()
+    """
+
+    garmin = _logged_in(server, pool_maxsize=len(Garmin.day_bundle_sections), **args.client_kwargs)
+    start = datetime.date(2021, 1, 1)
+    days = [start + datetime.timedelta(days=offset) for offset in range(min(args.days, 20))]
+    for day in days:
+        if bundle:
+            result = garmin.get_day_bundle(day)
+            if result.errors:
+                raise RuntimeError(f"Sections {sorted(result.errors)} failed.")
+        else:
+            for section in Garmin.day_bundle_sections:
+                getattr(garmin, f"get_{section}")(day.isoformat())
+    return len(days), "days"
+
+
+def bench_rhr_backfill(server, args, ranged):
+    """
+    Resting heart rate for three years, one request per day or through the range endpoint
+    """
+
+    garmin = _logged_in(server, **args.client_kwargs)
+    start = datetime.date(2019, 1, 1)
+    end = start + datetime.timedelta(days=3 * 365 - 1)
+    requests = server.requests
+    if ranged:
+        values = garmin.get_rhr_range(start, end, max_workers=args.workers)["allMetrics"]["metricsMap"]
+        days = len(values["WELLNESS_RESTING_HEART_RATE"])
+    else:
+        days = sum(result.error is None for result in garmin.get_range("rhr_day", start, end, max_workers=args.workers))
+    return days, f"days, {server.requests - requests} requests"
+
+
+def bench_fit_decode(server, args):
+    records = fit.read_records(args.fit_blob)
+    return len(records["timestamp"]), "records"
+
+
+def bench_tcx_parse(server, args):
+    track = xmltrack.read_track(args.tcx_blob)
+    return len(track["timestamp"]), "points"
+
+
+SCENARIOS = {
+    "login": bench_login,
+    "backfill_sequential": bench_backfill_sequential,
+    "backfill_range": bench_backfill_range,
+    "pagination": lambda server, args: bench_pagination(server, args, prefetch=0),
+    "pagination_prefetch": lambda server, args: bench_pagination(server, args, prefetch=4),
+    "downloads": bench_downloads,
+    "shared_client": bench_shared_client,
+    "device_polling": lambda server, args: bench_device_polling(server, args, cache=False),
+    "device_polling_etag": lambda server, args: bench_device_polling(server, args, cache=True),
+    "day_view": lambda server, args: bench_day_view(server, args, bundle=False),
+    "day_view_bundle": lambda server, args: bench_day_view(server, args, bundle=True),
+    "rhr_backfill": lambda server, args: bench_rhr_backfill(server, args, ranged=False),
+    "rhr_backfill_range": lambda server, args: bench_rhr_backfill(server, args, ranged=True),
+    "device_alarms": lambda server, args: bench_device_alarms(server, args, max_workers=1),
+    "device_alarms_fanout": lambda server, args: bench_device_alarms(server, args, max_workers=args.workers),
+    "fit_decode": bench_fit_decode,
+    "tcx_parse": bench_tcx_parse,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.02, help="server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.005, help="latency jitter in seconds")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of API requests answered with 429")
+    parser.add_argument("--days", type=int, default=60, help="days in the backfill scenarios")
+    parser.add_argument("--activities", type=int, default=500, help="activities served by the mock server")
+    parser.add_argument("--downloads", type=int, default=40, help="files in the download scenario")
+    parser.add_argument("--download-size", type=int, default=512 * 1024, help="size of each download in bytes")
+    parser.add_argument("--fit-seconds", type=int, default=4 * 3600, help="records in the FIT and TCX scenarios")
+    parser.add_argument("--workers", type=int, default=8, help="worker threads for concurrent scenarios")
+    parser.add_argument("--shared-threads", type=int, default=32, help="threads sharing one client in shared_client")
+    parser.add_argument("--session-requests", type=int, default=100,
+                        help="requests per server session in shared_client")
+    parser.add_argument("--devices", type=int, default=24, help="registered devices in the device_alarms scenarios")
+    parser.add_argument("--only", action="append", choices=sorted(SCENARIOS), help="run only these scenarios")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Built up front so fit_decode and tcx_parse time only the parsers
+    args.fit_blob = fit_activity(args.fit_seconds)
+    args.tcx_blob = tcx_activity(args.fit_seconds)
+
+    print(f"{'scenario':<22}{'items':>8}{'seconds':>10}{'items/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'429s':>6}")
+    with MockGarminServer(latency=args.latency, jitter=args.jitter, throttle_rate=args.throttle_rate,
+                          activities=args.activities, download_size=args.download_size) as server:
+        for name in args.only or SCENARIOS:
+            metrics = MetricsRegistry()
+            args.client_kwargs = {"metrics": metrics}
+            if args.throttle_rate:
+                args.client_kwargs["rate_limiter"] = RateLimiter(rate=None, max_concurrency=args.workers,
+                                                                 backoff_base=0.01)
+
+            start = time.perf_counter()
+            items, unit = SCENARIOS[name](server, args)
+            elapsed = time.perf_counter() - start
+
+            endpoints = metrics.snapshot().values()
+            p50 = max((stats["p50"] or 0 for stats in endpoints), default=0) * 1000
+            p95 = max((stats["p95"] or 0 for stats in endpoints), default=0) * 1000
+            throttled = sum(stats["statuses"].get("429", 0) for stats in endpoints)
+            print(f"{name:<22}{items:>8}{elapsed:>10.3f}{items / elapsed:>10.1f}{p50:>9.1f}{p95:>9.1f}{throttled:>6}"
+                  f"  {unit}")
+
+
+if __name__ == "__main__":
+    main()
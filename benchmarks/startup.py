@@ -0,0 +1,58 @@
+"""
+Cold start cost of the client, each round timed in a fresh interpreter
+
+    python -m benchmarks.startup [--rounds 10]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import garminconnect
+imported = time.perf_counter()
+eager = "requests" in sys.modules
+garmin = garminconnect.Garmin("benchmark@example.com", "password")
+constructed = time.perf_counter()
+garmin.session
+built = time.perf_counter()
+print(json.dumps({
+    "import garminconnect": imported - start,
+    "Garmin()": constructed - imported,
+    "first session": built - constructed,
+    "requests imported eagerly": eager,
+}))
+"""
+
+
+def _probe():
+    output = subprocess.run([sys.executable, "-c", PROBE], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10, help="fresh interpreters to time")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    samples = [_probe() for _ in range(args.rounds)]
+
+    print(f"{'step':<22}{'p50 ms':>9}{'min ms':>9}")
+    for step in ("import garminconnect", "Garmin()", "first session"):
+        values = [sample[step] * 1000 for sample in samples]
+        print(f"{step:<22}{statistics.median(values):>9.1f}{min(values):>9.1f}")
+    if any(sample["requests imported eagerly"] for sample in samples):
+        print("requests was imported by 'import garminconnect'")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,310 @@
 Python API wrapper for Garmin Connect to grab data and statistics
 """
 
+import copy
+import datetime
+import functools
+import hashlib
 import json
 import logging
+import os
 import re
-import requests
-import cloudscraper
+import tempfile
+import threading
+import time
 
 
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, auto
 from typing import Any, Dict
 
+from . import codec, details, endpoints, fit, timeseries, xmltrack
+from .cache import CachedResponse, ResponseCache, SingleFlight
+from .metrics import MetricsRegistry
+from .models import Activity, DailySummary
+from .ratelimit import RateLimiter, TokenBucket
+from .sync import ActivitySync
+from .timeseries import TimeSeries
+from .transport import RecordingTransport, ReplayTransport, SessionTransport, TransportError, with_session
+
 
 logger = logging.getLogger(__name__)
 
 
+DayResult = namedtuple("DayResult", "date data error")
+DownloadResult = namedtuple("DownloadResult", "activity_id path size skipped error")
+DeviceSettingsResult = namedtuple("DeviceSettingsResult", "settings errors")
+DayBundle = namedtuple("DayBundle", "date data errors timings")
+
+# Logins a single request may trigger (or wait for) on 401 responses before failing
+REAUTHENTICATE_ATTEMPTS = 3
+
+# Longest span in days asked from each range endpoint in one request; longer spans are split into windows
+RANGE_WINDOW_DAYS = {
+    "rhr": 365,
+    "max_metrics": 365,
+    "body_composition": 365,
+}
+
+# Lets get_user_summary() refuse privacy protected summaries without decoding them, see endpoints.check_user_summary()
+PRIVACY_PROTECTED = re.compile(rb'"privacyProtected"\s*:\s*true')
+
+
+def _to_date(value):
+    """
+    Accept a datetime.date/datetime or a 'YYYY-MM-DD' string and return a datetime.date
+    """
+
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+
+    return datetime.date.fromisoformat(str(value))
+
+
+def _date_span(start_date, end_date):
+    """
+    Return 'start_date' and 'end_date' as datetime.date, refusing an end before the start
+    """
+
+    start = _to_date(start_date)
+    end = _to_date(end_date)
+    if end < start:
+        raise ValueError(f"Unexpected value {end_date} for end_date, it precedes {start_date}.")
+
+    return start, end
+
+
+def _date_range(start_date, end_date):
+    """
+    Return every day between 'start_date' and 'end_date' (inclusive)
+    """
+
+    start, end = _date_span(start_date, end_date)
+
+    return [start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def _date_windows(start_date, end_date, days):
+    """
+    Split 'start_date' to 'end_date' (inclusive) into consecutive (first, last) ISO date pairs of at most 'days' days
+    """
+
+    start, end = _date_span(start_date, end_date)
+
+    windows = []
+    while start <= end:
+        last = min(start + datetime.timedelta(days=days - 1), end)
+        windows.append((start.isoformat(), last.isoformat()))
+        start = last + datetime.timedelta(days=1)
+
+    return windows
+
+
+def _merge_rhr(responses, start_date, end_date):
+    """
+    Merge the resting heart rate responses of consecutive windows into one for the whole span
+    """
+
+    merged = dict(responses[0])
+    metrics_map = {}
+    for response in responses:
+        for name, values in ((response.get("allMetrics") or {}).get("metricsMap") or {}).items():
+            metrics_map.setdefault(name, []).extend(values or [])
+    merged["allMetrics"] = {**(merged.get("allMetrics") or {}), "metricsMap": metrics_map}
+    if "statisticsStartDate" in merged:
+        merged["statisticsStartDate"] = start_date
+        merged["statisticsEndDate"] = end_date
+
+    return merged
+
+
+def _merge_max_metrics(responses):
+    """
+    Merge the per-day max metrics lists of consecutive windows
+    """
+
+    return [entry for response in responses for entry in response or []]
+
+
+def _merge_body_composition(responses, start_date, end_date):
+    """
+    Merge the body composition responses of consecutive windows: the weigh-ins are concatenated
+    and the numeric fields of 'totalAverage' averaged again over all of them
+    """
+
+    merged = dict(responses[0])
+    entries = [entry for response in responses for entry in response.get("dateWeightList") or []]
+    merged["dateWeightList"] = entries
+    merged["startDate"] = start_date
+    merged["endDate"] = end_date
+
+    averages = [response.get("totalAverage") or {} for response in responses]
+    average = {}
+    for window_average in averages:
+        for key, value in window_average.items():
+            if average.get(key) is None:
+                average[key] = value
+    for key in average:
+        values = [entry[key] for entry in entries if isinstance(entry.get(key), (int, float))]
+        if values:
+            mean = sum(values) / len(values)
+            # Integer fields such as metabolicAge or physiqueRating stay integers
+            average[key] = round(mean) if all(isinstance(value, int) for value in values) else mean
+    if "until" in average:
+        average["until"] = next((window_average["until"] for window_average in reversed(averages)
+                                 if window_average.get("until") is not None), average["until"])
+    merged["totalAverage"] = average
+
+    return merged
+
+
+def _day_bundle_sections(include):
+    """
+    Validate the sections requested from get_day_bundle(), all of Garmin.day_bundle_sections by default
+    """
+
+    if include is None:
+        return Garmin.day_bundle_sections
+
+    sections = tuple(include)
+    for section in sections:
+        if section not in Garmin.day_bundle_sections:
+            raise ValueError(f"Unexpected value {section} for include, expected some of {Garmin.day_bundle_sections}.")
+
+    return sections
+
+
+def _ordered_map(func, items, max_workers):
+    """
+    Call 'func' for every item on a bounded thread pool and yield (item, result, error) in input order.
+    At most 2 * max_workers calls are queued ahead of the consumer.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= 2 * max_workers:
+                yield _collect(*pending.popleft())
+        while pending:
+            yield _collect(*pending.popleft())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _collect(item, future):
+    try:
+        return item, future.result(), None
+    except Exception as err:
+        return item, None, err
+
+
+def _new_session():
+    """
+    Build the default cloudscraper session. cloudscraper (and requests) are imported here, on
+    first use, as both are slow to import and the scraper's browser/cipher setup is slow too.
+    """
+
+    import cloudscraper
+
+    return cloudscraper.CloudScraper()
+
+
+def _resize_connection_pool(session, maxsize, block=False):
+    """
+    Mount new http and https adapters on 'session' keeping up to 'maxsize' connections per host.
+    With 'block' callers wait for a free connection instead of opening (and discarding) extra ones.
+    The TLS setup (cipher suite) of a cloudscraper adapter is carried over to its replacement.
+    """
+
+    import requests
+
+    for prefix in ("https://", "http://"):
+        current = session.get_adapter(prefix)
+        options = {"pool_maxsize": maxsize, "pool_block": block, "max_retries": current.max_retries}
+        if hasattr(current, "ssl_context"):
+            # cloudscraper.CipherSuiteAdapter, whose ssl_context holds the cipher setup
+            adapter = type(current)(ssl_context=current.ssl_context, source_address=current.source_address,
+                                    **options)
+        else:
+            adapter = requests.adapters.HTTPAdapter(**options)
+        session.mount(prefix, adapter)
+
+
+def _clone_session(template):
+    """
+    Return a session sharing the adapters (and so the connection pool and TLS setup) of
+    'template' but with its own cookies and headers
+    """
+
+    import requests
+
+    session = copy.copy(template)
+    session.headers = template.headers.copy()
+    session.cookies = requests.cookies.RequestsCookieJar()
+    session.adapters = OrderedDict(template.adapters)
+    session.hooks = {event: list(hooks) for event, hooks in template.hooks.items()}
+    session.proxies = dict(template.proxies)
+
+    return session
+
+
+def _response_size(response, stream):
+    """
+    Return the body size of a response without consuming a streamed body
+    """
+
+    if not stream:
+        return len(response.content or b"")
+
+    try:
+        return int(response.headers.get("Content-Length", 0))
+    except ValueError:
+        return 0
+
+
+def _read_download_manifest(path):
+    """
+    Return {file name: {'size', 'sha256'}} from a download manifest, the last record of a file wins
+    """
+
+    manifest = {}
+    if not os.path.exists(path):
+        return manifest
+
+    with open(path, encoding="utf-8") as manifest_file:
+        for line in manifest_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            manifest[entry["name"]] = entry
+
+    return manifest
+
+
+def _matches_download(path, entry, verify_hash):
+    try:
+        if os.path.getsize(path) != entry["size"]:
+            return False
+    except OSError:
+        return False
+
+    if not verify_hash:
+        return True
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as existing:
+        for chunk in iter(lambda: existing.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest() == entry["sha256"]
+
+
 class ApiClient:
     """
     Class for a single API endpoint
@@ -26,18 +316,77 @@ class ApiClient:
         "User-Agent": "Mozilla/5.0 (Macinthosh; Intel Mac OS X 10.14, rv:66.0) Gecko/20100101 Firefox/66.0"
     }
 
+    # Overridable to talk to a local stand-in server, see benchmarks/
+    scheme = "https"
+
+    @property
+    def session(self):
+        """
+        The requests session, built by 'session_factory' on first use
+        """
+
+        if self._session is None:
+            session = self.session_factory()
+            for cookies in self._pending_cookies:
+                session.cookies.update(cookies)
+            self._pending_cookies = []
+            self._session = session
+
+        return self._session
+
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
+
+    def login_client(self, session):
+        """
+        Return a copy of this client sending through 'session', without cache, request
+        coalescing or reauthentication, for running the login flow on a separate cookie jar
+        """
+
+        client = copy.copy(self)
+        client._session = session
+        client._pending_cookies = []
+        if self.transport is not None:
+            client.transport = with_session(self.transport, session)
+        client.cache = None
+        client.single_flight = None
+        client.reauthenticate = None
+
+        return client
+
 
     def set_cookies(self, cookies):
+        """
+        Add cookies (a cookie jar or a dict); before the session exists they are kept until it is built
+        """
+
         logger.debug('Restoring cookies for saved session.')
-        self.session.cookies.update(cookies)
+        if self._session is None:
+            self._pending_cookies.append(cookies)
+        else:
+            self._session.cookies.update(cookies)
 
     
     def get_cookies(self):
-        return self.session.cookies
+        if self._session is None:
+            import requests
+
+            jar = requests.cookies.RequestsCookieJar()
+            for cookies in self._pending_cookies:
+                jar.update(cookies)
+            return jar
+
+        return self._session.cookies
 
 
     def clear_cookies(self):
-        self.session.cookies.clear()
+        if self._session is None:
+            self._pending_cookies = []
+        else:
+            self._session.cookies.clear()
 
 
     def url(self, add_url=None):
@@ -45,15 +394,19 @@ class ApiClient:
         
         """
 
-        path = f"https://{self.base_url}"
+        path = f"{self.scheme}://{self.base_url}"
         if add_url is not None:
             path += f"/{add_url}"
         
         return path
 
 
-    def get(self, add_url, additional_headers=None, params=None):
+    def get(self, add_url, additional_headers=None, params=None, stream=False, validate=None):
         """
+        With 'stream' the body is not downloaded up front (and never cached), see requests' iter_content().
+        A stored response which expired is revalidated with If-None-Match / If-Modified-Since
+        and reused on a 304. 'validate' is called with the body of a successful response and may
+        raise to reject it, in which case it is neither cached nor returned.
         """
 
         total_headers = self.headers.copy()
@@ -61,24 +414,42 @@ class ApiClient:
             total_headers.update(additional_headers)
         url = self.url(add_url)
 
-        logger.debug("URL: %s", url)
-        logger.debug("headers: %s", total_headers)
+        ttl = 0
+        cache_key = None
+        stale = None
+        if self.cache is not None and not stream:
+            ttl = self.cache.ttl_for(url, params)
+            cache_key = self.cache.key(url, params, self.cache_namespace)
+            cached = self.cache.get(cache_key) if ttl > 0 else None
+            if cached is not None:
+                logger.debug("Cached URL: %s", url)
+                return cached
+            stale = self.cache.get_stale(cache_key)
+            if stale is not None:
+                total_headers.update(self.cache.validators(stale))
+
+        def fetch():
+            logger.debug("URL: %s", url)
+            logger.debug("headers: %s", total_headers)
+
+            response = self._request("GET", url, total_headers, params, stream=stream, add_url=add_url,
+                                     validate=validate)
+            if response.status_code == 304 and stale is not None:
+                logger.debug("Not modified, using cached response for URL: %s", url)
+                response.close()
+                self.cache.refresh(cache_key, ttl)
+                return stale
+            if cache_key is not None:
+                self.cache.set(cache_key, response, ttl)
 
-        try:
-            response = self.session.get(url, headers=total_headers, params=params)
-            response.raise_for_status()
-            # logger.debug("Response: %s", response.content)
             return response
-        except Exception as err:
-            logger.debug("Response in exception: %s", response.content)
-            if response.status_code == 429:
-                raise GarminConnectTooManyRequestsError(f"Too many requests: {err}") from err
-            if response.status_code == 401:
-                raise GarminConnectAuthenticationError(f"Authentication error: {err}") from err
-            if response.status_code == 403:
-                raise GarminConnectConnectionError(f"Forbidden URL: {url}") from err
 
-            raise GarminConnectConnectionError(err) from err
+        if self.single_flight is None or stream:
+            return fetch()
+
+        return self.single_flight.do(self.single_flight.key(url, params, self.cache_namespace),
+                                     lambda: CachedResponse.from_response(fetch()))
+
 
     def post(self, add_url, additional_headers, params, data):
         """
@@ -93,29 +464,190 @@ class ApiClient:
         logger.debug("Headers: %s", total_headers)
         logger.debug("Data: %s", data)
 
-        try:
-            response = self.session.post(url, headers=total_headers, params=params, data=data)
-            response.raise_for_status()
-            # logger.debug("Response: %s", response.content)
-            return response
-        except Exception as err:
+        return self._request("POST", url, total_headers, params, data=data, add_url=add_url)
+
+
+    def get_json(self, add_url, additional_headers=None, params=None, raw=False, validate=None):
+        """
+        Return the decoded JSON body of a GET request, or the undecoded body bytes with 'raw'
+        """
+
+        response = self.get(add_url, additional_headers, params, validate=validate)
+        if raw:
+            return response.content
+        if self.metrics is None:
+            return self._decode(response)
+
+        start = time.perf_counter()
+        data = self._decode(response)
+        self.metrics.observe_decode(self.endpoint_name(add_url), time.perf_counter() - start)
+
+        return data
+
+
+    def _decode(self, response):
+        if isinstance(response, CachedResponse) and self.json_loads is codec.loads:
+            # Memoized, so callers sharing a coalesced response decode it once
+            return response.json()
+
+        return self.json_loads(response.content)
+
+
+    def endpoint_name(self, add_url):
+        """
+        Return the logical endpoint name of a path, used to label metrics.
+        The longest matching prefix in 'endpoint_names' names the endpoint, followed by any
+        remaining path segments which are not IDs, dates or the display name.
+        """
+
+        add_url = (add_url or "").strip("/")
+        name, rest = None, add_url
+        for prefix in sorted(self.endpoint_names, key=len, reverse=True):
+            if add_url == prefix or add_url.startswith(prefix + "/"):
+                name, rest = self.endpoint_names[prefix], add_url[len(prefix):]
+                break
+
+        segments = [
+            segment for segment in rest.split("/")
+            if segment and segment != self.cache_namespace and not any(char.isdigit() for char in segment)
+        ]
+        if name is not None:
+            segments.insert(0, name)
+
+        return "/".join(segments) or "index"
+
+
+    def _request(self, method, url, headers, params, data=None, stream=False, add_url=None, validate=None):
+        """
+        Send a request through the rate limiter, retrying throttled responses, and map errors to exceptions.
+        A 401, or a body 'validate' rejects with GarminConnectAuthenticationError, is replayed after
+        calling 'reauthenticate', when set, once per session generation (a replay failing again is
+        only retried when sent with cookies renewed since) and at most REAUTHENTICATE_ATTEMPTS times.
+        """
+
+        endpoint = self.endpoint_name(add_url) if self.metrics is not None else None
+        attempt = 0
+        # Session generations a 401 was answered for
+        reauthenticated = []
+        while True:
+            rejected = None
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            generation = self.generation
+            start = time.perf_counter()
+            response = None
+            try:
+                response = self._send(method, url, headers=headers, params=params, data=data, stream=stream)
+            except Exception as err:
+                # Not only requests/transport errors: cloudscraper raises plain Exception subclasses
+                if self.metrics is not None:
+                    self.metrics.observe_request(endpoint, None, time.perf_counter() - start)
+                raise GarminConnectConnectionError(err) from err
+            finally:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.release(throttled=response is not None and response.status_code == 429)
+
+            if self.metrics is not None:
+                self.metrics.observe_request(endpoint, response.status_code, time.perf_counter() - start,
+                                             _response_size(response, stream))
+
+            if self.rate_limiter is not None and self.rate_limiter.should_retry(response.status_code, attempt):
+                delay = self.rate_limiter.backoff(attempt, response.headers.get("Retry-After"))
+                logger.debug("Got %d, retrying in %.1f seconds.", response.status_code, delay)
+                if self.metrics is not None:
+                    self.metrics.observe_retry(endpoint)
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if validate is not None and not stream and response.status_code < 400:
+                try:
+                    validate(response.content)
+                except GarminConnectAuthenticationError as err:
+                    # An expired session, answered with a 200 by some endpoints
+                    rejected = err
+
+            expired = response.status_code == 401 or rejected is not None
+            if (expired and self.reauthenticate is not None and generation not in reauthenticated
+                    and len(reauthenticated) < REAUTHENTICATE_ATTEMPTS):
+                reauthenticated.append(generation)
+                if self._reauthenticate(generation):
+                    logger.debug("Replaying request to %s.", url)
+                    if self.metrics is not None:
+                        self.metrics.observe_retry(endpoint)
+                    response.close()
+                    continue
+
+            break
+
+        if response.status_code >= 400:
             logger.debug("Response in exception: %s", response.content)
+            err = f"{response.status_code} Error: {response.reason} for url: {response.url}"
             if response.status_code == 429:
-                raise GarminConnectTooManyRequestsError(f"Too many requests: {err}") from err
+                raise GarminConnectTooManyRequestsError(f"Too many requests: {err}")
             if response.status_code == 401:
-                raise GarminConnectAuthenticationError(f"Authentication error: {err}") from err
+                raise GarminConnectAuthenticationError(f"Authentication error: {err}")
             if response.status_code == 403:
-                raise GarminConnectConnectionError(f"Forbidden URL: {url}") from err
+                raise GarminConnectConnectionError(f"Forbidden URL: {url}")
+
+            raise GarminConnectConnectionError(err)
+
+        if rejected is not None:
+            raise rejected
+
+        return response
 
-            raise GarminConnectConnectionError(err) from err
 
+    def _send(self, method, url, **kwargs):
+        if self.transport is not None:
+            return self.transport.request(method, url, **kwargs)
 
-    def __init__(self, session, base_url, headers=None, additional_headers=None):
+        return self.session.request(method, url, **kwargs)
+
+
+    def _reauthenticate(self, generation):
+        logger.debug("Session expired, authenticating again.")
+        try:
+            return self.reauthenticate(generation)
+        except Exception as err:
+            logger.debug("Authentication failed: %s", err)
+            return False
+
+
+    def __init__(self, session, base_url, headers=None, additional_headers=None, cache=None, rate_limiter=None,
+                 single_flight=None, metrics=None, transport=None, session_factory=None):
         """
+        'session' is a requests session, or None to have 'session_factory' (by default a new
+        cloudscraper.CloudScraper) build one on the first request,
+        'cache' is an optional ResponseCache consulted by get(),
+        'rate_limiter' an optional RateLimiter pacing and retrying requests,
+        'single_flight' an optional SingleFlight coalescing identical concurrent get() calls,
+        'metrics' an optional MetricsRegistry recording every request,
+        'transport' an optional transport (see garminconnect.transport) sending requests instead of 'session'
         """
         
-        self.session = session
+        self._session = session
+        self._pending_cookies = []
+        self.session_factory = session_factory or _new_session
         self.base_url = base_url
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.single_flight = single_flight
+        self.metrics = metrics
+        self.transport = transport
+        # Decodes JSON bodies from bytes, see garminconnect.codec.get_loads()
+        self.json_loads = codec.loads
+
+        # Path prefix -> logical endpoint name, see endpoint_name()
+        self.endpoint_names = {}
+
+        # Optional callable renewing the session, called once when a request gets a 401 with the
+        # 'generation' the request was sent under; it returns True when the request should be replayed
+        self.reauthenticate = None
+        # Bumped by the owner every time it installs new session cookies
+        self.generation = 0
+        self.cache_namespace = None
 
         if headers:
             self.headers = headers
@@ -129,16 +661,51 @@ class ApiClient:
 
 class Garmin:
     """
+    Garmin Connect client. One instance can be shared by many threads: requests only read the
+    shared session, and an expired session is renewed by a single thread under a lock while
+    the others wait for it and replay their request with the new cookies. Pass 'pool_maxsize'
+    of at least the number of threads so that each keeps its own connection.
     """
 
-    def __init__(self, email, password, is_cn=False, session_data=None):
-        """
-        
+    # Per-day getters which can be fetched for a whole date range with get_range()
+    daily_metrics = (
+        "user_summary",
+        "heart_rate",
+        "sleep_data",
+        "steps_data",
+        "stress_data",
+        "hydration_data",
+        "respiration_data",
+        "spo2_data",
+        "rhr_day",
+    )
+
+    # Sections get_day_bundle() can fetch for one day
+    day_bundle_sections = daily_metrics + ("body_composition", "max_metrics")
+
+    def __init__(self, email, password, is_cn=False, session_data=None, cache=None, rate_limiter=None,
+                 single_flight=None, validate_session=True, session=None, metrics=None, transport=None,
+                 pool_maxsize=None):
+        """
+        'session' is an optional requests session to use instead of a cloudscraper.CloudScraper,
+        which is only built (and cloudscraper imported) when the first request is sent.
+        'pool_maxsize' sizes the connection pool per host (requests keeps 10 by default); threads
+        beyond it wait for a free connection instead of opening throwaway ones.
+        'validate_session' makes login() check a restored 'session_data' against the SSO login page,
+        without it the cookies are trusted and the session is only renewed on the first 401.
+        'cache' is an optional ResponseCache used for Garmin Connect API responses,
+        'rate_limiter' an optional RateLimiter shared by all requests of this client,
+        'single_flight' an optional SingleFlight sharing identical concurrent API requests (and their parsed result),
+        'metrics' an optional MetricsRegistry recording latency, size and status of every request per endpoint,
+        'transport' an optional transport replacing the session for sending requests, e.g. a RecordingTransport
+        or ReplayTransport from garminconnect.transport
         """
 
         self.session_data = session_data
+        self.validate_session = validate_session
 
         self.username = email
+        self.password = password
         self.is_cn = is_cn
 
         self.garmin_connect_base_url = "https://connect.garmin.com"
@@ -191,21 +758,68 @@ class Garmin:
             "NK": "NT"
         }
 
-        self.session = cloudscraper.CloudScraper()
+        self.pool_maxsize = pool_maxsize
+        self._session = None
+        self._session_lock = threading.Lock()
+        if session is not None:
+            self._install_session(session)
+
+        # Serializes logging in; reentrant as authenticate() runs inside login() and _reauthenticate()
+        self._auth_lock = threading.RLock()
+        # Number of times new session cookies were installed, see _reauthenticate()
+        self.auth_generation = 0
+
+        self.sso_rest_client = ApiClient(self._session, self.garmin_connect_sso_url, additional_headers=self.garmin_headers,
+                                         rate_limiter=rate_limiter, metrics=metrics, transport=transport,
+                                         session_factory=self._get_session)
+        self.modern_rest_client = ApiClient(self._session, self.garmin_connect_modern_url, additional_headers=self.garmin_headers,
+                                            cache=cache, rate_limiter=rate_limiter, single_flight=single_flight,
+                                            metrics=metrics, transport=transport, session_factory=self._get_session)
+        self.modern_rest_client.endpoint_names = {
+            path: name[len("garmin_connect_"):].replace("_url", "")
+            for name, path in vars(self).items()
+            if name.startswith("garmin_connect_") and isinstance(path, str) and path.startswith("proxy/")
+        }
 
-        self.sso_rest_client = ApiClient(self.session, self.garmin_connect_sso_url, additional_headers=self.garmin_headers)
-        self.modern_rest_client = ApiClient(self.session, self.garmin_connect_modern_url, additional_headers=self.garmin_headers)
+        self.modern_rest_client.reauthenticate = self._reauthenticate
 
         self.display_name = None
         self.full_name = None
         self.unit_system = None
 
+        # Device list reused by get_device_alarms()
+        self._devices = None
+
+    @property
+    def session(self):
+        """
+        The session shared by both API clients, built on first use
+        """
+
+        return self._get_session()
+
+
+    def _get_session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._install_session(_new_session())
+
+        return self._session
+
+
+    def _install_session(self, session):
+        if self.pool_maxsize is not None:
+            _resize_connection_pool(session, self.pool_maxsize, block=True)
+        self._session = session
+
+
     @staticmethod
     def __get_json(page_html, key):
         """
         """
 
-        found = re.search(key + r" = (\{.*\});", page_html. re.M)
+        found = re.search(key + r" = (\{.*\});", page_html, re.M)
         if found:
             json_text = found.group(1).replace('\\"', '"')
             return json.loads(json_text)
@@ -213,10 +827,48 @@ class Garmin:
         return None
 
     def login(self):
-        if (self.session_data is None):
+        with self._auth_lock:
+            if (self.session_data is None):
+                return self.authenticate()
+            elif self.validate_session:
+                return self.login_session()
+            else:
+                return self.restore_session()
+
+
+    def restore_session(self):
+        """
+        Restore the cookies and user details of 'session_data' without any request.
+        An expired session is renewed transparently by the first API call getting a 401 (or a
+        privacy protected user summary, see endpoints.check_user_summary()).
+        """
+
+        logger.debug("Restoring session without validation.")
+
+        self.modern_rest_client.set_cookies(self.session_data['session_cookies'])
+        self.sso_rest_client.set_cookies(self.session_data['login_cookies'])
+
+        self.display_name = self.session_data['display_name']
+        self.modern_rest_client.cache_namespace = self.display_name
+        self.full_name = self.session_data.get('full_name')
+        self.unit_system = self.session_data.get('unit_system')
+
+        return True
+
+
+    def _reauthenticate(self, generation):
+        """
+        Renew an expired session, called by the API client on a 401 (or a rejected body) of a request
+        sent under 'generation'. Threads hitting the 401 together wait for the first one to log in again,
+        then replay their request with the cookies it installed.
+        """
+
+        with self._auth_lock:
+            if generation != self.auth_generation:
+                logger.debug("Session was renewed by another thread.")
+                return True
+
             return self.authenticate()
-        else:
-            return self.login_session()
 
     
     def login_session(self):
@@ -224,8 +876,8 @@ class Garmin:
 
         session_display_name = self.session_data['display_name']
         logger.debug('Set cookies in session')
-        self.modern_rest_client.set_cookies(requests.utils.cookiejar_from_dict(self.session_data['session_cookies']))
-        self.sso_rest_client.set_cookies(requests.utils.cookiejar_from_dict(self.session_data['login_cookies']))
+        self.modern_rest_client.set_cookies(self.session_data['session_cookies'])
+        self.sso_rest_client.set_cookies(self.session_data['login_cookies'])
 
         logger.debug("Get page data with cookies.")
         params = {
@@ -242,12 +894,13 @@ class Garmin:
             logger.debug("Session expired, autenticating again.")
             return self.authenticate()
 
-        user_preferences = self.__get_json(response.text, "VIEWER_USERPREDERENCES")
+        user_preferences = self.__get_json(response.text, "VIEWER_USERPREFERENCES")
         if (user_preferences is None):
             logger.debug("Session expired, authenticating again.")
             return self.authenticate()
 
         self.display_name = user_preferences["displayName"]
+        self.modern_rest_client.cache_namespace = self.display_name
         logger.debug("Display name is %s", self.display_name)
 
         self.unit_system = user_preferences["measurementSystem"]
@@ -268,22 +921,30 @@ class Garmin:
         # TODO add better description
         """
         Login to Garmin Connect.
+        The login flow runs on its own cookie jar, which replaces the session cookies only once
+        it succeeded, so requests in flight on other threads keep the cookies they were sent with.
         """
 
+        with self._auth_lock:
+            return self._authenticate()
+
+
+    def _authenticate(self):
         logger.debug("Login: %s %s", self.username, self.password)
-        self.modern_rest_client.clear_cookies()
-        self.sso_rest_client.clear_cookies()
+        login_session = _clone_session(self.session)
+        sso_rest_client = self.sso_rest_client.login_client(login_session)
+        modern_rest_client = self.modern_rest_client.login_client(login_session)
 
         get_headers = {
             "Referer": self.garmin_connect_login_url
         }
         params = {
-            "service": self.modern_rest_client.url(),
+            "service": modern_rest_client.url(),
             "webhost": self.garmin_connect_base_url,
             "source": self.garmin_connect_login_url,
-            "redirectAfterAccountLoginUrl": self.modern_rest_client.url(),
-            "redirectAfterAccountCreationUrl": self.modern_rest_client.url(),
-            "gauthHost": self.sso_rest_client.url(),
+            "redirectAfterAccountLoginUrl": modern_rest_client.url(),
+            "redirectAfterAccountCreationUrl": modern_rest_client.url(),
+            "gauthHost": sso_rest_client.url(),
             "locale": "en_US",
             "id": "gauth-widget",
             "cssUrl": self.garmin_connect_css_url,
@@ -311,7 +972,7 @@ class Garmin:
         if self.is_cn:
             params["cssUrl"] = "https://static.garmincdn.cn/cn.garmin.connect/ui/css/gauth-custom-v1.2-min.css"
 
-        response = self.sso_rest_client.get(self.garmin_connect_sso_login, get_headers, params)
+        response = sso_rest_client.get(self.garmin_connect_sso_login, get_headers, params)
 
         found = re.search(r"name=\"_csrf\" value=\"(\w*)", response.text, re.M)
         if not found:
@@ -332,10 +993,10 @@ class Garmin:
         
         post_headers = {
             "Referer": referer,
-            "Content Type": "application/x-www-form-urlencoded"
+            "Content-Type": "application/x-www-form-urlencoded"
         }
 
-        response = self.sso_rest_client.post(self.garmin_connect_sso_login, post_headers, params, data)
+        response = sso_rest_client.post(self.garmin_connect_sso_login, post_headers, params, data)
         found = re.search(r"\?ticket=([\w-]*)", response.text, re.M)
         if not found:
             logger.error("Login ticket not found (%d).", response.status_code)
@@ -345,10 +1006,11 @@ class Garmin:
             "ticket": found.group(1)
         }
 
-        response = self.modern_rest_client.get("", params=params)
+        response = modern_rest_client.get("", params=params)
 
         user_preferences = self.__get_json(response.text, "VIEWER_USERPREFERENCES")
         self.display_name = user_preferences["displayName"]
+        self.modern_rest_client.cache_namespace = self.display_name
         logger.debug("Display name is %s", self.display_name)
 
         self.unit_system = user_preferences["measurementSystem"]
@@ -358,12 +1020,21 @@ class Garmin:
         self.full_name = social_profile["fullName"]
         logger.debug("Fullname is %s", self.full_name)
 
+        import requests
+
         self.session_data = {
             'display_name': self.display_name,
-            'session_cookies': requests.utils.dict_from_cookiejar(self.modern_rest_client.get_cookies()),
-            'login_cookies': requests.utils.dict_from_cookiejar(self.sso_rest_client.get_cookies())
+            'full_name': self.full_name,
+            'unit_system': self.unit_system,
+            'session_cookies': requests.utils.dict_from_cookiejar(login_session.cookies),
+            'login_cookies': requests.utils.dict_from_cookiejar(login_session.cookies)
         }
 
+        # Swap the whole jar, requests being prepared on other threads never see it half filled
+        self.session.cookies = login_session.cookies
+        self.auth_generation += 1
+        self.sso_rest_client.generation = self.modern_rest_client.generation = self.auth_generation
+
         return True
 
     def get_full_name(self):
@@ -381,278 +1052,414 @@ class Garmin:
         return self.unit_system
 
 
-    def get_stats(self, cdate: str) -> Dict[str, Any]:
+    def get_stats(self, cdate: str, raw=False, model=False) -> Dict[str, Any]:
         """
         Return user activity summary for 'cdate' format 'YYYY-MM-DD' which is compatible with Garmin  Connect
         """
 
-        return self.get_user_summary(cdate)
+        return self.get_user_summary(cdate, raw=raw, model=model)
 
     
-    def get_user_summary(self, cdate: str) -> Dict[str, Any]:
+    def get_user_summary(self, cdate: str, raw=False, model=False) -> Dict[str, Any]:
         """
-        
+        Return the daily summary of 'cdate', as a compact models.DailySummary with 'model'
         """
 
-        url = f"{self.garmin_connect_daily_summary_url}/{self.display_name}"
-        params = {
-            "calendarDate": str(cdate)
-        }
+        if raw and model:
+            raise ValueError("Only one of raw and model can be set.")
 
-        logger.debug('Requesting user summary')
+        path, params = endpoints.user_summary(self, cdate)
+        response = self.modern_rest_client.get_json(path, params=params, raw=raw,
+                                                    validate=endpoints.check_user_summary)
 
-        response = self.modern_rest_client.get(url, params=params).json()
-
-        if response['privacyProtected'] is True:
-            raise  GarminConnectAuthenticationError("Authentication error")
+        if model:
+            return DailySummary.from_dict(response)
 
         return response
 
 
-    def get_steps_data(self, cdate):
+    def get_steps_data(self, cdate, raw=False):
         """
         """
 
-        url = f"{self.garmin_connect_user_summary_chart}/{self.display_name}"
-        params = {
-            'date': str(cdate)
-        }
-
-        logger.debug("Requesting steps data")
+        path, params = endpoints.steps_data(self, cdate)
 
-        return self.modern_rest_client.get(url, params=params).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_heart_rate(self, cdate):
+    def get_heart_rate(self, cdate, raw=False):
         """
         """
 
-        url = f"{self.garmin_connect_heartrates_daily_url}/{self.display_name}"
-        params = {
-            'date': str(cdate)
-        }
-
-        logger.debug('Requesting heart rate data.')
+        path, params = endpoints.heart_rate(self, cdate)
 
-        return self.modern_rest_client.get(url, params=params).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
     def get_stats_and_body(self, cdate):
         """
+        Return the user summary merged with the average body composition of the day, both fetched concurrently
         """
 
+        bundle = self.get_day_bundle(cdate, include=("user_summary", "body_composition"))
+        for error in bundle.errors.values():
+            raise error
+
         return {
-            **self.get_stats(cdate),
-            **self.get_body_composition(cdate)['totalAverage']
+            **bundle.data["user_summary"],
+            **bundle.data["body_composition"]['totalAverage']
         }
 
 
-    def get_body_composition(self, start_date: str, end_date=None) -> Dict[str, Any]:
+    def get_day_bundle(self, cdate, include=None, max_workers=None, raw=False):
+        """
+        Fetch the sections in 'include' (by default all of day_bundle_sections) for day 'cdate'
+        concurrently, on 'max_workers' threads, so the call takes about as long as its slowest request.
+        By default there is one thread per section, but no more than the connections pooled per host
+        ('pool_maxsize', or requests' default of 10) since extra threads would open and discard connections.
+        Returns DayBundle(date, data, errors, timings): {section: response} for the sections
+        fetched, {section: exception} for those which failed and {section: seconds} for all.
+        """
+
+        sections = _day_bundle_sections(include)
+        cdate = _to_date(cdate).isoformat()
+        logger.debug("Requesting %d sections for %s.", len(sections), cdate)
+
+        if max_workers is None:
+            import requests
+
+            max_workers = max(min(len(sections), self.pool_maxsize or requests.adapters.DEFAULT_POOLSIZE), 1)
+
+        timings = {}
+
+        def fetch(section):
+            start = time.perf_counter()
+            try:
+                return getattr(self, f"get_{section}")(cdate, raw=raw)
+            finally:
+                timings[section] = time.perf_counter() - start
+
+        data, errors = {}, {}
+        for section, result, error in _ordered_map(fetch, sections, max_workers):
+            if error is None:
+                data[section] = result
+            else:
+                errors[section] = error
+
+        return DayBundle(cdate, data, errors, {section: timings[section] for section in sections})
+
+
+    def get_body_composition(self, start_date: str, end_date=None, raw=False, max_workers=4) -> Dict[str, Any]:
         """
+        Spans longer than RANGE_WINDOW_DAYS["body_composition"] are split into windows fetched
+        concurrently on up to 'max_workers' threads and merged into one response ('raw' is
+        only possible for a single window).
         """
 
         if end_date is None:
             end_date = start_date
-        
-        url = self.garmin_connect_weight_url
-        params = {
-            "startDate": str(start_date),
-            "endDate": str(end_date)
-        }
 
-        logger.debug('Requesting body composition.')
+        windows = _date_windows(start_date, end_date, RANGE_WINDOW_DAYS["body_composition"])
+        if len(windows) == 1:
+            return self._get_body_composition(*windows[0], raw=raw)
+        if raw:
+            raise ValueError(f"raw needs a span of at most {RANGE_WINDOW_DAYS['body_composition']} days.")
+
+        responses = self._fetch_windows(self._get_body_composition, windows, max_workers)
 
-        return self.modern_rest_client.get(url, params=params).json()
+        return _merge_body_composition(responses, windows[0][0], windows[-1][1])
 
 
-    def get_max_metrics(self, cdate: str) -> Dict[str, Any]:
+    def _get_body_composition(self, start_date, end_date, raw=False):
+        path, params = endpoints.body_composition(self, start_date, end_date)
+
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    def get_max_metrics(self, cdate: str, raw=False) -> Dict[str, Any]:
         """"
         """
 
-        url = f"{self.garmin_connect_metrics_url}/{cdate}/{cdate}"
-        logger.debug('Requesting max metrics.')
+        return self._get_max_metrics(cdate, cdate, raw=raw)
+
+
+    def get_max_metrics_range(self, start_date, end_date, max_workers=4):
+        """
+        Request the max metrics (VO2 max, fitness age) of every day from 'start_date' to 'end_date'
+        (inclusive) as one list like get_max_metrics(), with as few requests as RANGE_WINDOW_DAYS allows.
+        Windows are fetched concurrently on up to 'max_workers' threads.
+        """
+
+        windows = _date_windows(start_date, end_date, RANGE_WINDOW_DAYS["max_metrics"])
+
+        return _merge_max_metrics(self._fetch_windows(self._get_max_metrics, windows, max_workers))
+
+
+    def _get_max_metrics(self, start_date, end_date, raw=False):
+        path, params = endpoints.max_metrics(self, start_date, end_date)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_hydration_data(self, cdate: str) -> Dict[str, Any]:
+    def _fetch_windows(self, fetch, windows, max_workers):
         """
+        Call fetch(first, last) for every date window, concurrently when there are several,
+        returning the responses in window order; the first failure is raised
         """
 
-        url = f"{self.garmin_connect_daily_hydration_url}/{cdate}"
-        logger.debug('Requesting hydration data.')
+        if len(windows) == 1:
+            return [fetch(*windows[0])]
 
-        return self.modern_rest_client.get(url).json()
+        logger.debug("Requesting %d windows.", len(windows))
+        responses = []
+        for _, response, error in _ordered_map(lambda window: fetch(*window), windows, max_workers):
+            if error is not None:
+                raise error
+            responses.append(response)
 
+        return responses
 
-    def get_respiration_data(self, cdate: str) -> Dict[str, Any]:
+
+    def get_hydration_data(self, cdate: str, raw=False) -> Dict[str, Any]:
         """
         """
 
-        url = f"{self.garmin_connect_daily_respiration_url}/{cdate}"
-        logger.debug('Requesting respiration data.')
+        path, params = endpoints.hydration_data(self, cdate)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_spo2_data(self, cdate: str) -> Dict[str, Any]:
+    def get_respiration_data(self, cdate: str, raw=False) -> Dict[str, Any]:
         """
         """
 
-        url = f"{self.garmin_connect_daily_spo2_url}/{cdate}"
-        logger.debug('Requesting SpO2 data')
+        path, params = endpoints.respiration_data(self, cdate)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_personal_record(self) -> Dict[str, Any]:
+    def get_spo2_data(self, cdate: str, raw=False) -> Dict[str, Any]:
         """
         """
 
-        url = f"{self.garmin_connect_personal_record_url}/{self.display_name}"
-        logger.debug('Requesting personal records for user.')
+        path, params = endpoints.spo2_data(self, cdate)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_earned_badges(self) -> Dict[str, Any]:
+    def get_range(self, metric, start_date, end_date, max_workers=4, raw=False):
         """
+        Fetch daily 'metric' (one of Garmin.daily_metrics) for every day from 'start_date' to 'end_date' (inclusive).
+        Days are requested concurrently on up to 'max_workers' threads sharing this session and
+        yielded in date order as DayResult(date, data, error); a failed day carries its exception
+        in 'error' instead of aborting the range. With 'raw' data is the undecoded body.
         """
 
-        url = self.garmin_connect_earned_badges_url
-        logger.debug('Requesting earned badges for user.')
+        if metric not in self.daily_metrics:
+            raise ValueError(f"Unexpected value {metric} for metric, expected one of {self.daily_metrics}.")
+        if max_workers < 1:
+            raise ValueError(f"Unexpected value {max_workers} for max_workers.")
+
+        getter = functools.partial(getattr(self, f"get_{metric}"), raw=raw)
+        days = _date_range(start_date, end_date)
+        logger.debug("Requesting %s for %d days.", metric, len(days))
+
+        return self._iter_range(getter, days, max_workers)
 
-        return self.modern_rest_client.get(url).json()
 
+    def _iter_range(self, getter, days, max_workers):
+        for day, data, error in _ordered_map(lambda day: getter(day.isoformat()), days, max_workers):
+            if error is not None:
+                logger.debug("Request for %s failed: %s", day, error)
+            yield DayResult(day.isoformat(), data, error)
 
-    def get_adhoc_challenges(self, start, limit) -> Dict[str, Any]:
+
+    def get_timeseries(self, metric, start_date, end_date=None, max_workers=4):
         """
+        Return the intraday 'metric' (one of garminconnect.timeseries.SERIES: heart_rate, stress,
+        body_battery, respiration, spo2) from 'start_date' to 'end_date' (inclusive) as one TimeSeries
         """
 
-        url = self.garmin_connect_adhoc_challenges_url
-        params = {
-            "start": str(start),
-            "limit": str(limit)
-        }
+        if metric not in timeseries.SERIES:
+            raise ValueError(f"Unexpected value {metric} for metric, expected one of {tuple(timeseries.SERIES)}.")
+        if end_date is None:
+            end_date = start_date
 
-        logger.debug('Requesting adhoc challenges for user.')
+        daily_metric = timeseries.SERIES[metric][0]
+        days = []
+        for day, data, error in self.get_range(daily_metric, start_date, end_date, max_workers=max_workers):
+            if error is not None:
+                raise error
+            days.append(TimeSeries.from_response(metric, data))
 
-        return self.modern_rest_client.get(url, params=params).json()
+        return TimeSeries.concat(days, name=metric)
 
 
-    def get_badge_challenges(self, start, limit) -> Dict[str, Any]:
+    def get_personal_record(self, raw=False) -> Dict[str, Any]:
         """
         """
 
-        url = self.garmin_connect_badge_challenges_url
-        params = {
-            "start": str(start),
-            "limit": str(limit)
-        }
-        logger.debug('Requesting badge challenges for user.')
+        path, params = endpoints.personal_record(self)
+
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
-        return self.modern_rest_client.get(url, params=params).json()
 
+    def get_earned_badges(self, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.earned_badges(self)
 
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
-    def get_sleep_data(self, cdate: str) -> Dict[str, Any]:
+
+    def get_adhoc_challenges(self, start, limit, raw=False) -> Dict[str, Any]:
         """
         """
 
-        url = f"{self.garmin_connect_daily_sleep_url}/{self.display_name}"
-        params = {
-            "date": str(cdate),
-            "nonSleepBufferMinutes": 60
-        }
-        logger.debug('Requesting sleep data.')
+        path, params = endpoints.adhoc_challenges(self, start, limit)
 
-        return self.modern_rest_client.get(url, params=params).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_stress_data(self, cdate: str) ->  Dict[str,Any]:
+    def get_badge_challenges(self, start, limit, raw=False) -> Dict[str, Any]:
         """
         """
 
-        url = f"{self.garmin_connect_daily_stress_url}/{self.display_name}"
-        logger.debug('Requesting stress data.')
+        path, params = endpoints.badge_challenges(self, start, limit)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_rhr_day(self, cdate: str) -> Dict[str, Any]:
+
+    def get_sleep_data(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.sleep_data(self, cdate)
+
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    def get_stress_data(self, cdate: str, raw=False) ->  Dict[str,Any]:
+        """
+        """
+
+        path, params = endpoints.stress_data(self, cdate)
+
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    def get_rhr_day(self, cdate: str, raw=False) -> Dict[str, Any]:
         """
         Request resting heart rate (RHR) day data
         """
 
-        url = f"{self.garmin_connect_rhr}/{self.display_name}"
-        params = {
-            "fromDate": str(cdate),
-            "untilDate": str(cdate),
-            "metricId": 60
-        }
-        logger.debug('Requesting resting heart rate data.')
+        return self._get_rhr(cdate, cdate, raw=raw)
+
 
-        return self.modern_rest_client.get(url, params=params).json()
+    def get_rhr_range(self, start_date, end_date, max_workers=4):
+        """
+        Request resting heart rate (RHR) data from 'start_date' to 'end_date' (inclusive) as one
+        response like get_rhr_day(), with as few requests as RANGE_WINDOW_DAYS allows.
+        Windows are fetched concurrently on up to 'max_workers' threads.
+        """
+
+        windows = _date_windows(start_date, end_date, RANGE_WINDOW_DAYS["rhr"])
+
+        return _merge_rhr(self._fetch_windows(self._get_rhr, windows, max_workers), windows[0][0], windows[-1][1])
+
+
+    def _get_rhr(self, start_date, end_date, raw=False):
+        path, params = endpoints.rhr(self, start_date, end_date)
 
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
-    def get_devices(self) -> Dict[str, Any]:
+
+    def get_devices(self, raw=False) -> Dict[str, Any]:
         """
         
         """
 
-        url = self.garmin_connect_devices_url
-        logger.debug('Requesting devices.')
+        path, params = endpoints.devices(self)
+
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    def get_device_settings(self, device_id: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.device_settings(self, device_id)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_device_settings(self, device_id: str) -> Dict[str, Any]:
+    def get_device_settings_many(self, device_ids, max_workers=4, raw=False):
         """
+        Fetch the settings of several devices concurrently on up to 'max_workers' threads.
+        Returns DeviceSettingsResult(settings, errors): {device id: settings} for the devices
+        fetched and {device id: exception} for those which failed.
         """
 
-        url = f"{self.garmin_connect_device_url}/device-info/settings/{device_id}"
-        logger.debug('Requesting device settings')
+        device_ids = list(device_ids)
+        logger.debug("Requesting settings of %d devices.", len(device_ids))
+
+        settings, errors = {}, {}
+        results = _ordered_map(lambda device_id: self.get_device_settings(device_id, raw=raw), device_ids, max_workers)
+        for device_id, data, error in results:
+            if error is None:
+                settings[device_id] = data
+            else:
+                errors[device_id] = error
 
-        return self.modern_rest_client.get(url).json()
+        return DeviceSettingsResult(settings, errors)
 
 
-    def get_device_alarms(self) -> Dict[str, Any]:
+    def get_device_alarms(self, max_workers=4, refresh=False) -> Dict[str, Any]:
         """
+        The device list is fetched once and reused by later calls unless 'refresh' is set;
+        the settings of all devices are fetched concurrently (see get_device_settings_many()).
         """
 
         logger.debug("Requesting device alarms.")
 
+        if self._devices is None or refresh:
+            self._devices = self.get_devices()
+        device_ids = [device["deviceId"] for device in self._devices]
+        result = self.get_device_settings_many(device_ids, max_workers=max_workers)
+
         alarms = []
-        devices = self.get_devices()
-        for device in devices:
-            device_settings = self.get_device_settings(device["deviceId"])
-            alarms += device_settings["alarms"]
+        for device_id in device_ids:
+            if device_id in result.errors:
+                raise result.errors[device_id]
+            alarms += result.settings[device_id]["alarms"]
         return alarms
 
 
-    def get_last_used_device(self):
+    def get_last_used_device(self, raw=False):
         """
         """
 
-        url = f"{self.garmin_connect_device_url}/mylastused"
-        logger.debug("Requesting last used device.")
+        path, params = endpoints.last_used_device(self)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_activities(self, start, limit):
+    def get_activities(self, start, limit, raw=False, model=False):
         """
+        Return activities 'start' to 'start' + 'limit', as compact models.Activity records with 'model'
         """
 
-        url = self.garmin_connect_activities
-        params = {
-            "start": str(start),
-            "limit": str(limit)
-        }
+        if raw and model:
+            raise ValueError("Only one of raw and model can be set.")
 
-        logger.debug("Requesting activities.")
+        path, params = endpoints.activities(self, start, limit)
+        activities = self.modern_rest_client.get_json(path, params=params, raw=raw)
+        if model:
+            return Activity.from_list(activities)
 
-        return self.modern_rest_client.get(url, params=params).json()
+        return activities
 
 
     def get_last_activity(self):
@@ -666,47 +1473,74 @@ class Garmin:
         return None
 
 
-    def get_activities_by_date(self, start_date, end_date, activity_type=None):
+    def get_activities_by_date(self, start_date, end_date, activity_type=None, model=False):
         """
         Fetch available activities between specific dates
         :param start_date: String in the format YYYY-MM-DD
         :param end_date: String in the format YYYY-MM-DD
         :param activity_type: (Optional) Type of activity you are searching.
                                Possible values are [cycling, running, swimmin, multi_sport, fitness_equipment, hiking, walking, other]
+        :param model: Return compact models.Activity records instead of dicts
         :return: list of JSON activities
         """
 
-        activities = []
-        start = 0
-        limit = 20
+        logger.debug("Requesting activities by date from %s to %s.", start_date, end_date)
 
-        # mimicking the behavior of the web interface that fetches 20 activities at a time and automatically loads more on scroll
+        return list(self.iter_activities(start_date, end_date, activity_type=activity_type, model=model))
 
-        url = self.garmin_connect_activities
-        params = {
-            "startDate": str(start_date),
-            "endDate": str(end_date),
-            "start": str(start),
-            "limit": str(limit)
-        }
 
-        if activity_type:
-            params["activityType"] = str(activity_type)
+    def iter_activities(self, start_date, end_date, page_size=20, prefetch=2, activity_type=None, model=False):
+        """
+        Yield activities between specific dates as their pages arrive
+        :param start_date: String in the format YYYY-MM-DD, or None for no lower bound
+        :param end_date: String in the format YYYY-MM-DD, or None for no upper bound
+        :param page_size: Number of activities requested per page
+        :param prefetch: Number of pages fetched ahead in the background, 0 fetches pages on demand
+        :param activity_type: (Optional) Type of activity you are searching.
+        :param model: Yield compact models.Activity records instead of dicts
+        :return: generator of JSON activities
 
-        print(f"Requesting activities by date from {start_date} to {end_date}.")
+        At most prefetch + 1 pages are held in memory. Since the end of the list is only known
+        once a short page arrives, up to 'prefetch' requests past the end may be issued.
+        """
 
-        while True:
-            params["start"] = str(start)
-            logger.debug(f"Requesting activities {start} to {start+limit}.")
-            act = self.modern_rest_client.get(url, params=params).json()
-            if act:
-                activities.extend(act)
-                start = start + limit
-            else:
-                break
+        filters = {"start_date": start_date, "end_date": end_date, "activity_type": activity_type}
+        activities = self._iter_activity_pages(filters, page_size, prefetch)
+        if model:
+            return map(Activity.from_dict, activities)
 
         return activities
 
+
+    def _iter_activity_pages(self, filters, page_size, prefetch):
+        def fetch(start):
+            path, params = endpoints.activities(self, start, page_size, **filters)
+            return self.modern_rest_client.get_json(path, params=params)
+
+        if prefetch < 1:
+            start = 0
+            while True:
+                page = fetch(start)
+                yield from page
+                if len(page) < page_size:
+                    return
+                start += page_size
+
+        executor = ThreadPoolExecutor(max_workers=prefetch)
+        pending = deque()
+        next_start = 0
+        try:
+            while True:
+                while len(pending) <= prefetch:
+                    pending.append(executor.submit(fetch, next_start))
+                    next_start += page_size
+                page = pending.popleft().result()
+                yield from page
+                if len(page) < page_size:
+                    return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
     class ActivityDownloadFormat(Enum):
         """
         """
@@ -717,103 +1551,206 @@ class Garmin:
         KML = auto()
         CSV = auto()
 
+    # File extension used by download_activities() for each format
+    download_extensions = {
+        ActivityDownloadFormat.ORIGINAL: "zip",
+        ActivityDownloadFormat.TCX: "tcx",
+        ActivityDownloadFormat.GPX: "gpx",
+        ActivityDownloadFormat.KML: "kml",
+        ActivityDownloadFormat.CSV: "csv",
+    }
+
+    # Append-only record of completed downloads kept in the destination directory
+    download_manifest = ".garminconnect-downloads.jsonl"
+
     def download_activity(self, activity_id, dl_fmt=ActivityDownloadFormat.TCX):
         """
         
         """
 
+        url = endpoints.activity_download(self, activity_id, dl_fmt)
+
+        logger.debug("Downloading activities from %s", url)
 
-        activity_id = str(activity_id)
+        return self.modern_rest_client.get(url).content
 
-        urls = {
-            Garmin.ActivityDownloadFormat.ORIGINAL: f"{self.garmin_connect_fit_download}/{activity_id}",
-            Garmin.ActivityDownloadFormat.TCX: f"{self.garmin_connect_tcx_download}/{activity_id}",
-            Garmin.ActivityDownloadFormat.GPX: f"{self.garmin_connect_gpx_download}/{activity_id}",
-            Garmin.ActivityDownloadFormat.KML: f"{self.garmin_connect_kml_download}/{activity_id}",
-            Garmin.ActivityDownloadFormat.CSV: f"{self.garmin_connect_csv_download}/{activity_id}"
-        }
 
-        if dl_fmt not in urls:
+    def get_activity_records(self, activity_id):
+        """
+        Download the original FIT file of an activity and decode its record messages into
+        NumPy columns, see garminconnect.fit.read_records()
+        """
+
+        return fit.read_records(self.download_activity(activity_id, self.ActivityDownloadFormat.ORIGINAL))
+
+
+    def get_activity_track(self, activity_id, dl_fmt=ActivityDownloadFormat.TCX):
+        """
+        Download the TCX (or GPX) export of an activity and parse its trackpoints into NumPy
+        columns, see garminconnect.xmltrack.read_track()
+        """
+
+        if dl_fmt not in (self.ActivityDownloadFormat.TCX, self.ActivityDownloadFormat.GPX):
+            raise ValueError(f"Unexpected value {dl_fmt} for dl_fmt.")
+
+        return xmltrack.read_track(self.download_activity(activity_id, dl_fmt))
+
+
+    def download_activities(self, activity_ids, dl_fmt=ActivityDownloadFormat.TCX, dest_dir=".", max_workers=4,
+                            max_bytes_per_sec=None, verify_hash=False, chunk_size=64 * 1024):
+        """
+        Download activities to '<dest_dir>/<activity_id>.<ext>' on up to 'max_workers' threads
+        :param activity_ids: Iterable of activity IDs
+        :param dl_fmt: Garmin.ActivityDownloadFormat of the files
+        :param dest_dir: Directory the files are written to, created when missing
+        :param max_workers: Number of concurrent downloads
+        :param max_bytes_per_sec: (Optional) Bandwidth cap shared by all downloads
+        :param verify_hash: Compare the SHA-256 of existing files before skipping them, not only their size
+        :param chunk_size: Size of the chunks streamed to disk
+        :return: list of DownloadResult(activity_id, path, size, skipped, error) in input order
+
+        Bodies are streamed to a temporary file which is renamed into place once complete.
+        Completed downloads are recorded in a manifest, so an interrupted export can simply be
+        restarted: files already on disk with the recorded size (and hash) are skipped.
+        """
+
+        if dl_fmt not in self.download_extensions:
             raise ValueError(f"Unexpected value {dl_fmt} for dl_fmt.")
-        url = urls[dl_fmt]
 
+        os.makedirs(dest_dir, exist_ok=True)
+        manifest_path = os.path.join(dest_dir, self.download_manifest)
+        manifest = _read_download_manifest(manifest_path)
+        manifest_lock = threading.Lock()
+
+        throttle = None
+        if max_bytes_per_sec:
+            throttle = TokenBucket(max_bytes_per_sec, burst=max(chunk_size, max_bytes_per_sec))
+
+        with open(manifest_path, "a", encoding="utf-8") as manifest_file:
+
+            def download(activity_id):
+                name = f"{activity_id}.{self.download_extensions[dl_fmt]}"
+                path = os.path.join(dest_dir, name)
+
+                entry = manifest.get(name)
+                if entry is not None and _matches_download(path, entry, verify_hash):
+                    logger.debug("Skipping %s, already downloaded.", path)
+                    return DownloadResult(activity_id, path, entry["size"], True, None)
+
+                url = endpoints.activity_download(self, activity_id, dl_fmt)
+                size, sha256 = self._download_to_file(url, path, chunk_size, throttle)
+                with manifest_lock:
+                    manifest_file.write(json.dumps({"name": name, "size": size, "sha256": sha256}) + "\n")
+                    manifest_file.flush()
+
+                return DownloadResult(activity_id, path, size, False, None)
+
+            results = []
+            for activity_id, result, error in _ordered_map(download, activity_ids, max_workers):
+                if error is not None:
+                    logger.debug("Download of activity %s failed: %s", activity_id, error)
+                    result = DownloadResult(activity_id, None, None, False, error)
+                results.append(result)
+
+        return results
+
+
+    def _download_to_file(self, url, path, chunk_size, throttle=None):
         logger.debug("Downloading activities from %s", url)
 
-        return self.modern_rest_client.get(url).content
+        digest = hashlib.sha256()
+        size = 0
+        response = self.modern_rest_client.get(url, stream=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if throttle is not None:
+                        throttle.consume(len(chunk))
+                    temp_file.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        finally:
+            response.close()
+
+        return size, digest.hexdigest()
 
 
-    def get_activity_splits(self, activity_id):
+    def get_activity_splits(self, activity_id, raw=False):
         """
         Return activity splits.
         """
 
-        activity_id = str(activity_id)
-        url = f"{self.garmin_connect_activity}/{activity_id}/splits"
-        logger.debug("Requesting splits for activity ID %s", activity_id)
+        path, params = endpoints.activity_splits(self, activity_id)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_activity_split_summaries(self, activity_id):
+    def get_activity_split_summaries(self, activity_id, raw=False):
         """
         """
 
-        activity_id = str(activity_id)
-        url = f"{self.garmin_connect_activity}/{activity_id}/split_summaries"
-        logger.debug("Requesting split summaries for activity ID %s", activity_id)
+        path, params = endpoints.activity_split_summaries(self, activity_id)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_activity_weather(self, activity_id):
+    def get_activity_weather(self, activity_id, raw=False):
         """
         
         """
 
-        activity_id = str(activity_id)
-        url = f"{self.garmin_connect_activity}/{activity_id}/weather"
-        logger.debug("Requesting weather for activity ID %s", activity_id)
+        path, params = endpoints.activity_weather(self, activity_id)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_activity_hr_timezones(self, activity_id):
+    def get_activity_hr_timezones(self, activity_id, raw=False):
         """
         Return activity heart rate timezones.
         """
 
-        activity_id = str(activity_id)
-        url = f"{self.garmin_connect_activity}/{activity_id}/hrTimeInZones"
-        logger.debug("Requesting split summaries for activity ID %s", activity_id)
+        path, params = endpoints.activity_hr_timezones(self, activity_id)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_activity_evaluation(self, activity_id):
+    def get_activity_evaluation(self, activity_id, raw=False):
         """
         """
 
-        activity_id = str(activity_id)
-        url = f"{self.garmin_connect_activity}/{activity_id}"
-        logger.debug("Requesting self-evaluation data for activity ID %s", activity_id)
+        path, params = endpoints.activity_evaluation(self, activity_id)
 
-        return self.modern_rest_client.get(url).json()
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
 
-    def get_activity_details(self, activity_id, max_chart=2000, max_poly=4000):
+    def get_activity_details(self, activity_id, max_chart=2000, max_poly=4000, raw=False, full_resolution=False):
         """
+        Return the chart metrics and GPS polyline of an activity, downsampled by Garmin to at most
+        'max_chart' samples and 'max_poly' points. The endpoint has no paging; 'full_resolution'
+        raises both limits to the elapsed seconds of the activity (one extra request) so that
+        per-second recordings come back whole.
         """
 
-        activity_id = str(activity_id)
-        params = {
-            "maxChartSize": str(max_chart),
-            "maxPolylineSize": str(max_poly)
-        }
+        seconds = 0
+        if full_resolution:
+            seconds = endpoints.activity_seconds(self.get_activity_evaluation(activity_id))
+        path, params = endpoints.activity_details(self, activity_id, max_chart, max_poly, seconds)
+
+        return self.modern_rest_client.get_json(path, params=params, raw=raw)
 
-        url = self.garmin_connect_gear
-        logger.debug("Requesting gear for activity ID %s", activity_id)
 
-        return self.modern_rest_client.get(url, params=params).json()
+    def get_activity_detail_columns(self, activity_id, max_chart=2000, max_poly=4000, full_resolution=False):
+        """
+        Return get_activity_details() decoded into named NumPy columns, see garminconnect.details.decode()
+        """
+
+        return details.decode(self.get_activity_details(activity_id, max_chart, max_poly,
+                                                        full_resolution=full_resolution))
 
 
     def logout(self):
@@ -839,3 +1776,6 @@ class GarminConnectTooManyRequestsError(Exception):
 class GarminConnectAuthenticationError(Exception):
     """
     """
+
+
+from .pool import GarminPool  # noqa: E402  (pool builds on Garmin)
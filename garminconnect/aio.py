@@ -0,0 +1,784 @@
+"""
+Asyncio client for Garmin Connect built on aiohttp
+
+    from garminconnect.aio import AsyncGarmin
+
+    async with AsyncGarmin(email, password, session_data=session_data) as client:
+        summaries = await client.get_range("user_summary", "2021-01-01", "2021-12-31")
+"""
+
+import asyncio
+import logging
+import time
+
+from typing import Any, Dict
+
+from . import (
+    DayBundle,
+    DayResult,
+    DeviceSettingsResult,
+    Garmin,
+    GarminConnectAuthenticationError,
+    GarminConnectConnectionError,
+    GarminConnectTooManyRequestsError,
+    RANGE_WINDOW_DAYS,
+    TimeSeries,
+    _date_range,
+    _date_windows,
+    _day_bundle_sections,
+    _merge_body_composition,
+    _merge_max_metrics,
+    _merge_rhr,
+    _to_date,
+    codec,
+    endpoints,
+    timeseries,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def _import_aiohttp():
+    try:
+        import aiohttp
+    except ImportError as err:
+        raise ImportError("AsyncGarmin requires the 'aiohttp' package.") from err
+
+    return aiohttp
+
+
+class AsyncApiClient:
+    """
+    Asyncio counterpart of ApiClient for a single API endpoint
+    """
+
+    default_headers = {
+        "User-Agent": "Mozilla/5.0 (Macinthosh; Intel Mac OS X 10.14, rv:66.0) Gecko/20100101 Firefox/66.0"
+    }
+
+    # Taken over from the ApiClient of the same endpoint by AsyncGarmin
+    scheme = "https"
+
+
+    def __init__(self, session, base_url, headers=None, additional_headers=None, semaphore=None, scheme=None):
+        """
+        'session' is an aiohttp.ClientSession, 'semaphore' an optional asyncio.Semaphore bounding in-flight requests.
+        """
+
+        self.session = session
+        self.base_url = base_url
+        if scheme is not None:
+            self.scheme = scheme
+        self.semaphore = semaphore
+        # Decodes JSON bodies from bytes, see garminconnect.codec.get_loads()
+        self.json_loads = codec.loads
+
+        if headers:
+            self.headers = headers
+
+        else:
+            self.headers = self.default_headers.copy()
+
+        if additional_headers:
+            self.headers.update(additional_headers)
+
+
+    def set_cookies(self, cookies):
+        logger.debug('Restoring cookies for saved session.')
+        self.session.cookie_jar.update_cookies(cookies, response_url=self._yarl_url())
+
+
+    def get_cookies(self):
+        return {cookie.key: cookie.value for cookie in self.session.cookie_jar.filter_cookies(self._yarl_url()).values()}
+
+
+    def clear_cookies(self):
+        self.session.cookie_jar.clear()
+
+
+    def _yarl_url(self):
+        from yarl import URL
+
+        return URL(self.url())
+
+
+    def url(self, add_url=None):
+        """
+        """
+
+        path = f"{self.scheme}://{self.base_url}"
+        if add_url is not None:
+            path += f"/{add_url}"
+
+        return path
+
+
+    async def get(self, add_url, additional_headers=None, params=None):
+        """
+        Return the aiohttp response with its body already read
+        """
+
+        return await self._request("GET", add_url, additional_headers, params)
+
+
+    async def post(self, add_url, additional_headers, params, data):
+        """
+        """
+
+        return await self._request("POST", add_url, additional_headers, params, data)
+
+
+    async def get_json(self, add_url, additional_headers=None, params=None, raw=False, validate=None):
+        """
+        Return the decoded JSON body, or the undecoded body bytes with 'raw'.
+        'validate' is called with the body and may raise to reject it, see ApiClient.get().
+        """
+
+        response = await self.get(add_url, additional_headers, params)
+        content = await response.read()
+        if validate is not None:
+            validate(content)
+        if raw:
+            return content
+
+        return self.json_loads(content)
+
+
+    async def _request(self, method, add_url, additional_headers, params, data=None):
+        aiohttp = _import_aiohttp()
+
+        total_headers = self.headers.copy()
+        if additional_headers:
+            total_headers.update(additional_headers)
+        url = self.url(add_url)
+
+        logger.debug("URL: %s", url)
+        logger.debug("Headers: %s", total_headers)
+
+        if params:
+            params = {key: str(value) for key, value in params.items()}
+
+        try:
+            if self.semaphore is None:
+                response = await self._send(method, url, total_headers, params, data)
+            else:
+                async with self.semaphore:
+                    response = await self._send(method, url, total_headers, params, data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise GarminConnectConnectionError(err) from err
+
+        if response.status >= 400:
+            logger.debug("Response in exception: %s", await response.read())
+            err = f"{response.status} {response.reason} for url: {url}"
+            if response.status == 429:
+                raise GarminConnectTooManyRequestsError(f"Too many requests: {err}")
+            if response.status == 401:
+                raise GarminConnectAuthenticationError(f"Authentication error: {err}")
+            if response.status == 403:
+                raise GarminConnectConnectionError(f"Forbidden URL: {url}")
+
+            raise GarminConnectConnectionError(err)
+
+        return response
+
+
+    async def _send(self, method, url, headers, params, data):
+        # Reading the whole body returns the connection to the pool while keeping
+        # the body cached on the response for later read()/json() calls.
+        response = await self.session.request(method, url, headers=headers, params=params, data=data)
+        await response.read()
+
+        return response
+
+
+class AsyncGarmin:
+    """
+    Asyncio counterpart of Garmin with the same endpoint surface.
+
+    Authentication reuses Garmin.authenticate() (or an existing 'session_data'), after which
+    all requests are issued on one aiohttp session with at most 'max_concurrency' in flight.
+    """
+
+    def __init__(self, email, password, is_cn=False, session_data=None, max_concurrency=100):
+        """
+        """
+
+        self.garmin = Garmin(email, password, is_cn=is_cn, session_data=session_data)
+        self.__dict__.update({
+            name: value for name, value in vars(self.garmin).items() if name.startswith("garmin_connect_")
+        })
+
+        self.session_data = session_data
+        self.max_concurrency = max_concurrency
+
+        self.session = None
+        self.sso_rest_client = None
+        self.modern_rest_client = None
+
+        self.display_name = None
+        self.full_name = None
+        self.unit_system = None
+
+        # Device list reused by get_device_alarms()
+        self._devices = None
+
+
+    @classmethod
+    def from_garmin(cls, garmin, max_concurrency=100):
+        """
+        Build an AsyncGarmin sharing the session of an already logged in Garmin instance
+        """
+
+        client = cls(garmin.username, garmin.password, is_cn=garmin.is_cn, session_data=garmin.session_data,
+                     max_concurrency=max_concurrency)
+        client.full_name = garmin.full_name
+        client.unit_system = garmin.unit_system
+        for name in ("sso_rest_client", "modern_rest_client"):
+            source, target = getattr(garmin, name), getattr(client.garmin, name)
+            target.scheme, target.base_url = source.scheme, source.base_url
+
+        return client
+
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+    def _open(self):
+        if self.session is not None:
+            return
+
+        aiohttp = _import_aiohttp()
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            cookie_jar=aiohttp.CookieJar()
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        headers = self.garmin.garmin_headers
+        self.sso_rest_client = self._async_client(self.garmin.sso_rest_client, headers, semaphore)
+        self.modern_rest_client = self._async_client(self.garmin.modern_rest_client, headers, semaphore)
+
+
+    def _async_client(self, client, headers, semaphore):
+        # Same endpoint as the ApiClient 'client', so a redirected Garmin (see benchmarks/) redirects this one too
+        return AsyncApiClient(self.session, client.base_url, additional_headers=headers, semaphore=semaphore,
+                              scheme=client.scheme)
+
+
+    async def login(self):
+        """
+        Restore cookies from 'session_data', authenticating first (in a worker thread) when there is none.
+        """
+
+        self._open()
+
+        if self.session_data is None:
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, self.garmin.authenticate):
+                return False
+            self.session_data = self.garmin.session_data
+            self.full_name = self.garmin.full_name
+            self.unit_system = self.garmin.unit_system
+
+        logger.debug("Set cookies in session")
+        self.modern_rest_client.set_cookies(self.session_data['session_cookies'])
+        self.sso_rest_client.set_cookies(self.session_data['login_cookies'])
+        self.display_name = self.session_data['display_name']
+
+        return True
+
+
+    async def close(self):
+        """
+        """
+
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+    def get_full_name(self):
+        """
+        """
+
+        return self.full_name
+
+
+    def get_unit_system(self):
+        """
+        """
+
+        return self.unit_system
+
+
+    async def get_stats(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        Return user activity summary for 'cdate' format 'YYYY-MM-DD'
+        """
+
+        return await self.get_user_summary(cdate, raw=raw)
+
+
+    async def get_user_summary(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.user_summary(self, cdate)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw,
+                                                      validate=endpoints.check_user_summary)
+
+
+    async def get_steps_data(self, cdate, raw=False):
+        """
+        """
+
+        path, params = endpoints.steps_data(self, cdate)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_heart_rate(self, cdate, raw=False):
+        """
+        """
+
+        path, params = endpoints.heart_rate(self, cdate)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_stats_and_body(self, cdate):
+        """
+        """
+
+        stats, body = await asyncio.gather(self.get_stats(cdate), self.get_body_composition(cdate))
+
+        return {
+            **stats,
+            **body['totalAverage']
+        }
+
+
+    async def get_day_bundle(self, cdate, include=None, raw=False):
+        """
+        Fetch the sections in 'include' (by default all of Garmin.day_bundle_sections) for day
+        'cdate' concurrently, returning DayBundle(date, data, errors, timings) as Garmin.get_day_bundle()
+        """
+
+        sections = _day_bundle_sections(include)
+        cdate = _to_date(cdate).isoformat()
+        logger.debug("Requesting %d sections for %s.", len(sections), cdate)
+
+        timings = {}
+
+        async def fetch(section):
+            start = time.perf_counter()
+            try:
+                return await getattr(self, f"get_{section}")(cdate, raw=raw)
+            finally:
+                timings[section] = time.perf_counter() - start
+
+        results = await asyncio.gather(*(fetch(section) for section in sections), return_exceptions=True)
+
+        data, errors = {}, {}
+        for section, result in zip(sections, results):
+            if isinstance(result, Exception):
+                errors[section] = result
+            else:
+                data[section] = result
+
+        return DayBundle(cdate, data, errors, {section: timings[section] for section in sections})
+
+
+    async def get_body_composition(self, start_date: str, end_date=None, raw=False) -> Dict[str, Any]:
+        """
+        Spans longer than RANGE_WINDOW_DAYS["body_composition"] are fetched as concurrent windows
+        merged into one response, see Garmin.get_body_composition()
+        """
+
+        if end_date is None:
+            end_date = start_date
+
+        windows = _date_windows(start_date, end_date, RANGE_WINDOW_DAYS["body_composition"])
+        if len(windows) == 1:
+            return await self._get_body_composition(*windows[0], raw=raw)
+        if raw:
+            raise ValueError(f"raw needs a span of at most {RANGE_WINDOW_DAYS['body_composition']} days.")
+
+        responses = await asyncio.gather(*(self._get_body_composition(*window) for window in windows))
+
+        return _merge_body_composition(responses, windows[0][0], windows[-1][1])
+
+
+    async def _get_body_composition(self, start_date, end_date, raw=False):
+        path, params = endpoints.body_composition(self, start_date, end_date)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_max_metrics(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        return await self._get_max_metrics(cdate, cdate, raw=raw)
+
+
+    async def get_max_metrics_range(self, start_date, end_date):
+        """
+        Request the max metrics of every day from 'start_date' to 'end_date' (inclusive), see Garmin.get_max_metrics_range()
+        """
+
+        windows = _date_windows(start_date, end_date, RANGE_WINDOW_DAYS["max_metrics"])
+        responses = await asyncio.gather(*(self._get_max_metrics(*window) for window in windows))
+
+        return _merge_max_metrics(responses)
+
+
+    async def _get_max_metrics(self, start_date, end_date, raw=False):
+        path, params = endpoints.max_metrics(self, start_date, end_date)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_hydration_data(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.hydration_data(self, cdate)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_respiration_data(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.respiration_data(self, cdate)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_spo2_data(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.spo2_data(self, cdate)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_range(self, metric, start_date, end_date, raw=False):
+        """
+        Fetch daily 'metric' (one of Garmin.daily_metrics) for every day from 'start_date' to 'end_date' (inclusive).
+        Returns a list of DayResult(date, data, error) in date order, data being the undecoded body with 'raw'.
+        """
+
+        if metric not in Garmin.daily_metrics:
+            raise ValueError(f"Unexpected value {metric} for metric, expected one of {Garmin.daily_metrics}.")
+
+        getter = getattr(self, f"get_{metric}")
+        days = [day.isoformat() for day in _date_range(start_date, end_date)]
+        logger.debug("Requesting %s for %d days.", metric, len(days))
+
+        results = await asyncio.gather(*(getter(day, raw=raw) for day in days), return_exceptions=True)
+
+        return [
+            DayResult(day, None, result) if isinstance(result, Exception) else DayResult(day, result, None)
+            for day, result in zip(days, results)
+        ]
+
+
+    async def get_timeseries(self, metric, start_date, end_date=None):
+        """
+        Return the intraday 'metric' from 'start_date' to 'end_date' (inclusive) as one TimeSeries,
+        see Garmin.get_timeseries()
+        """
+
+        if metric not in timeseries.SERIES:
+            raise ValueError(f"Unexpected value {metric} for metric, expected one of {tuple(timeseries.SERIES)}.")
+        if end_date is None:
+            end_date = start_date
+
+        days = []
+        for day, data, error in await self.get_range(timeseries.SERIES[metric][0], start_date, end_date):
+            if error is not None:
+                raise error
+            days.append(TimeSeries.from_response(metric, data))
+
+        return TimeSeries.concat(days, name=metric)
+
+
+    async def get_personal_record(self, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.personal_record(self)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_earned_badges(self, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.earned_badges(self)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_adhoc_challenges(self, start, limit, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.adhoc_challenges(self, start, limit)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_badge_challenges(self, start, limit, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.badge_challenges(self, start, limit)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_sleep_data(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.sleep_data(self, cdate)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_stress_data(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.stress_data(self, cdate)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_rhr_day(self, cdate: str, raw=False) -> Dict[str, Any]:
+        """
+        Request resting heart rate (RHR) day data
+        """
+
+        return await self._get_rhr(cdate, cdate, raw=raw)
+
+
+    async def get_rhr_range(self, start_date, end_date):
+        """
+        Request resting heart rate (RHR) data from 'start_date' to 'end_date' (inclusive), see Garmin.get_rhr_range()
+        """
+
+        windows = _date_windows(start_date, end_date, RANGE_WINDOW_DAYS["rhr"])
+        responses = await asyncio.gather(*(self._get_rhr(*window) for window in windows))
+
+        return _merge_rhr(responses, windows[0][0], windows[-1][1])
+
+
+    async def _get_rhr(self, start_date, end_date, raw=False):
+        path, params = endpoints.rhr(self, start_date, end_date)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_devices(self, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.devices(self)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_device_settings(self, device_id: str, raw=False) -> Dict[str, Any]:
+        """
+        """
+
+        path, params = endpoints.device_settings(self, device_id)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_device_settings_many(self, device_ids, raw=False):
+        """
+        Fetch the settings of several devices concurrently, returning DeviceSettingsResult(settings, errors)
+        """
+
+        device_ids = list(device_ids)
+        logger.debug("Requesting settings of %d devices.", len(device_ids))
+
+        results = await asyncio.gather(*(self.get_device_settings(device_id, raw=raw) for device_id in device_ids),
+                                       return_exceptions=True)
+
+        settings, errors = {}, {}
+        for device_id, result in zip(device_ids, results):
+            if isinstance(result, Exception):
+                errors[device_id] = result
+            else:
+                settings[device_id] = result
+
+        return DeviceSettingsResult(settings, errors)
+
+
+    async def get_device_alarms(self, refresh=False) -> Dict[str, Any]:
+        """
+        The device list is fetched once and reused by later calls unless 'refresh' is set
+        """
+
+        logger.debug("Requesting device alarms.")
+
+        if self._devices is None or refresh:
+            self._devices = await self.get_devices()
+        device_ids = [device["deviceId"] for device in self._devices]
+        result = await self.get_device_settings_many(device_ids)
+
+        alarms = []
+        for device_id in device_ids:
+            if device_id in result.errors:
+                raise result.errors[device_id]
+            alarms += result.settings[device_id]["alarms"]
+        return alarms
+
+
+    async def get_last_used_device(self, raw=False):
+        """
+        """
+
+        path, params = endpoints.last_used_device(self)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_activities(self, start, limit, raw=False):
+        """
+        """
+
+        path, params = endpoints.activities(self, start, limit)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_last_activity(self):
+        """
+        """
+
+        activities = await self.get_activities(0, 1)
+        if activities:
+            return activities[-1]
+
+        return None
+
+
+    async def get_activities_by_date(self, start_date, end_date, activity_type=None):
+        """
+        Fetch available activities between specific dates
+        :param start_date: String in the format YYYY-MM-DD
+        :param end_date: String in the format YYYY-MM-DD
+        :param activity_type: (Optional) Type of activity you are searching.
+        :return: list of JSON activities
+        """
+
+        activities = []
+        start = 0
+        limit = 20
+
+        while True:
+            path, params = endpoints.activities(self, start, limit, start_date, end_date, activity_type)
+            page = await self.modern_rest_client.get_json(path, params=params)
+            activities.extend(page)
+            if len(page) < limit:
+                return activities
+            start += limit
+
+
+    async def download_activity(self, activity_id, dl_fmt=Garmin.ActivityDownloadFormat.TCX):
+        """
+        """
+
+        url = endpoints.activity_download(self, activity_id, dl_fmt)
+        logger.debug("Downloading activities from %s", url)
+
+        response = await self.modern_rest_client.get(url)
+
+        return await response.read()
+
+
+    async def get_activity_splits(self, activity_id, raw=False):
+        """
+        Return activity splits.
+        """
+
+        path, params = endpoints.activity_splits(self, activity_id)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_activity_split_summaries(self, activity_id, raw=False):
+        """
+        """
+
+        path, params = endpoints.activity_split_summaries(self, activity_id)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_activity_weather(self, activity_id, raw=False):
+        """
+        """
+
+        path, params = endpoints.activity_weather(self, activity_id)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_activity_hr_timezones(self, activity_id, raw=False):
+        """
+        Return activity heart rate timezones.
+        """
+
+        path, params = endpoints.activity_hr_timezones(self, activity_id)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_activity_evaluation(self, activity_id, raw=False):
+        """
+        """
+
+        path, params = endpoints.activity_evaluation(self, activity_id)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def get_activity_details(self, activity_id, max_chart=2000, max_poly=4000, raw=False,
+                                   full_resolution=False):
+        """
+        See Garmin.get_activity_details()
+        """
+
+        seconds = 0
+        if full_resolution:
+            seconds = endpoints.activity_seconds(await self.get_activity_evaluation(activity_id))
+        path, params = endpoints.activity_details(self, activity_id, max_chart, max_poly, seconds)
+
+        return await self.modern_rest_client.get_json(path, params=params, raw=raw)
+
+
+    async def logout(self):
+        """
+        """
+
+        await self.modern_rest_client.get(self.garmin_connect_logout)
@@ -0,0 +1,426 @@
+"""
+Response caching and request coalescing for ApiClient.get
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from . import codec
+
+
+logger = logging.getLogger(__name__)
+
+
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Response headers stored with a cached body
+STORED_HEADERS = ("content-type", "etag", "last-modified")
+
+
+class Headers(dict):
+    """
+    Response headers with case-insensitive lookups (keys are stored lower case)
+    """
+
+    def __init__(self, headers=None):
+        super().__init__((name.lower(), value) for name, value in (headers or {}).items())
+
+    def __getitem__(self, name):
+        return super().__getitem__(name.lower())
+
+    def __contains__(self, name):
+        return super().__contains__(name.lower())
+
+    def get(self, name, default=None):
+        return super().get(name.lower(), default)
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for requests.Response holding an already downloaded body.
+
+    json() decodes the body once and returns the same object on every call, so a response
+    shared between callers must be treated as read-only.
+    """
+
+    def __init__(self, content, status_code=200, headers=None, url=None, encoding="utf-8", reason=""):
+        """
+        """
+
+        self.content = content
+        self.status_code = status_code
+        self.headers = Headers(headers)
+        self.url = url
+        self.encoding = encoding
+        self.reason = reason
+        self._json = None
+        self._json_lock = threading.Lock()
+
+
+    @classmethod
+    def from_response(cls, response):
+        """
+        Copy a requests.Response (reading its body)
+        """
+
+        return cls(response.content, status_code=response.status_code, headers=dict(response.headers),
+                   url=response.url, encoding=response.encoding, reason=response.reason)
+
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+    def json(self, **kwargs):
+        if kwargs:
+            return json.loads(self.content, **kwargs)
+
+        with self._json_lock:
+            if self._json is None:
+                self._json = codec.loads(self.content)
+
+        return self._json
+
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+    def close(self):
+        pass
+
+
+class ResponseCache:
+    """
+    SQLite backed cache of GET responses, keyed by URL, params and display name.
+
+    Data for days that have closed does not change, so responses whose URL or params only
+    reference dates older than 'settle_days' are kept for 'past_ttl' seconds, while
+    responses about today (or the last 'settle_days' days, which a watch may still sync
+    into) expire after 'today_ttl'. Responses without any date use 'undated_ttl'; the
+    default of 0 leaves them uncached. Least recently used entries are evicted once the
+    cache holds more than 'max_entries' responses or 'max_bytes' of bodies.
+
+    With 'revalidate' JSON responses carrying an ETag or Last-Modified header are kept after they
+    expire (or right away, with a ttl of 0): ApiClient then sends the validators along and a
+    304 Not Modified is answered from the stored body.
+    """
+
+    def __init__(self, path=":memory:", past_ttl=30 * 24 * 3600, today_ttl=300, undated_ttl=0,
+                 settle_days=1, max_entries=10000, max_bytes=256 * 1024 * 1024, revalidate=True):
+        """
+        """
+
+        self.path = path
+        self.past_ttl = past_ttl
+        self.today_ttl = today_ttl
+        self.undated_ttl = undated_ttl
+        self.settle_days = settle_days
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.revalidate = revalidate
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidated = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB, "
+            "size INTEGER, expires REAL, accessed REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+
+    @staticmethod
+    def key(url, params=None, namespace=None):
+        """
+        Return the cache key for a request
+        """
+
+        params = sorted((str(name), str(value)) for name, value in (params or {}).items())
+        raw = json.dumps([namespace, url, params])
+
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+    def ttl_for(self, url, params=None):
+        """
+        Return how long (in seconds) a response for this request may be cached
+        """
+
+        text = " ".join([url] + [str(value) for value in (params or {}).values()])
+        dates = DATE_PATTERN.findall(text)
+        if not dates:
+            return self.undated_ttl
+
+        try:
+            newest = max(datetime.date.fromisoformat(date) for date in dates)
+        except ValueError:
+            return self.undated_ttl
+
+        if (datetime.date.today() - newest).days > self.settle_days:
+            return self.past_ttl
+
+        return self.today_ttl
+
+
+    def get(self, key):
+        """
+        Return the CachedResponse stored under 'key', or None when missing or expired
+        """
+
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status, headers, body, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[4] <= now:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+
+        url, status, headers, body, _ = row
+
+        return CachedResponse(body, status_code=status, headers=json.loads(headers), url=url)
+
+
+    def get_stale(self, key):
+        """
+        Return the CachedResponse stored under 'key' even when expired, provided it carries
+        validators to revalidate it with (see validators()), otherwise None
+        """
+
+        if not self.revalidate:
+            return None
+
+        with self._lock:
+            row = self._db.execute("SELECT url, status, headers, body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        url, status, headers, body = row
+        response = CachedResponse(body, status_code=status, headers=json.loads(headers), url=url)
+
+        return response if self.validators(response) else None
+
+
+    @staticmethod
+    def validators(response):
+        """
+        Return the conditional request headers revalidating a stored response
+        """
+
+        headers = {}
+        if response.headers.get("ETag"):
+            headers["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = response.headers["Last-Modified"]
+
+        return headers
+
+
+    def _revalidatable(self, response):
+        content_type = response.headers.get("Content-Type") or ""
+        return self.revalidate and "json" in content_type.lower() and bool(self.validators(response))
+
+
+    def refresh(self, key, ttl):
+        """
+        Mark the response stored under 'key' as confirmed unchanged (a 304) for another 'ttl' seconds
+        """
+
+        now = time.time()
+        with self._lock:
+            self.revalidated += 1
+            self._db.execute("UPDATE responses SET expires = ?, accessed = ? WHERE key = ?", (now + ttl, now, key))
+
+
+    def set(self, key, response, ttl):
+        """
+        Store a successful 'response' under 'key' for 'ttl' seconds, or as expired but
+        revalidatable when 'ttl' is 0 and it is JSON carrying validators (downloads and other
+        bodies are never kept just for revalidation)
+        """
+
+        if response.status_code != 200:
+            return
+        revalidatable = self._revalidatable(response)
+        if ttl <= 0 and not revalidatable:
+            return
+
+        body = response.content
+        stored = STORED_HEADERS if revalidatable else ("content-type",)
+        headers = {name: value for name, value in response.headers.items() if name.lower() in stored}
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.url, response.status_code, json.dumps(headers), body, len(body), now + ttl, now)
+            )
+            self._evict()
+
+
+    def _evict(self):
+        count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        for key, entry_size in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            size -= entry_size
+            evicted += 1
+
+        self.evictions += evicted
+        logger.debug("Evicted %d cached responses.", evicted)
+
+
+    def stats(self):
+        """
+        Return hit/miss/eviction counters and the current size of the cache
+        """
+
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "revalidated": self.revalidated,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+    def clear(self):
+        """
+        """
+
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+
+    def close(self):
+        """
+        """
+
+        with self._lock:
+            self._db.close()
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls using the same key into one.
+
+    While a call for a key is in flight, further callers wait for it and receive its result
+    (or exception) instead of starting their own. The result is then kept for 'memo_ttl'
+    seconds, during which callers are served without any call at all.
+    """
+
+    def __init__(self, memo_ttl=0.0):
+        """
+        """
+
+        self.memo_ttl = memo_ttl
+        self.calls = 0
+        self.shared = 0
+
+        self._lock = threading.Lock()
+        self._flights = {}
+
+
+    @staticmethod
+    def key(url, params=None, namespace=None):
+        """
+        Return the key of a request; 'namespace' (the display name) keeps the calls of
+        different accounts sharing one SingleFlight apart
+        """
+
+        params = sorted((str(name), str(value)) for name, value in (params or {}).items())
+
+        return json.dumps([namespace, url, params])
+
+
+    def do(self, key, func):
+        """
+        Return func(), or the result of an identical call that is in flight or memoized
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and (flight.expires is None or flight.expires > now):
+                self.shared += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func()
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and self.memo_ttl > 0:
+                    flight.expires = time.monotonic() + self.memo_ttl
+                    self._purge(now)
+                else:
+                    flight.expires = now
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+            flight.event.set()
+
+        return flight.result
+
+
+    def _purge(self, now):
+        expired = [key for key, flight in self._flights.items() if flight.expires is not None and flight.expires <= now]
+        for key in expired:
+            del self._flights[key]
+
+
+    def stats(self):
+        """
+        """
+
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared}
@@ -0,0 +1,79 @@
+"""
+JSON backends for decoding response bodies (and encoding stored payloads)
+"""
+
+import json
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+
+def get_loads(backend=None):
+    """
+    Return a function decoding a JSON body from bytes with 'backend' (one of BACKENDS),
+    by default the fastest one installed. orjson and msgspec parse the UTF-8 bytes directly
+    without building an intermediate str.
+    """
+
+    if backend is None:
+        backend = available_backends()[0]
+
+    if backend == "orjson":
+        if orjson is None:
+            raise ValueError("The orjson backend needs the orjson package.")
+        return orjson.loads
+    if backend == "msgspec":
+        if msgspec is None:
+            raise ValueError("The msgspec backend needs the msgspec package.")
+        return msgspec.json.Decoder().decode
+    if backend == "json":
+        return json.loads
+
+    raise ValueError(f"Unexpected value {backend} for backend, expected one of {BACKENDS}.")
+
+
+def get_dumps(backend=None):
+    """
+    Return a function encoding an object to compact JSON bytes with 'backend' (see get_loads())
+    """
+
+    if backend is None:
+        backend = available_backends()[0]
+
+    if backend == "orjson":
+        if orjson is None:
+            raise ValueError("The orjson backend needs the orjson package.")
+        return orjson.dumps
+    if backend == "msgspec":
+        if msgspec is None:
+            raise ValueError("The msgspec backend needs the msgspec package.")
+        return msgspec.json.Encoder().encode
+    if backend == "json":
+        return lambda data: json.dumps(data, separators=(",", ":")).encode()
+
+    raise ValueError(f"Unexpected value {backend} for backend, expected one of {BACKENDS}.")
+
+
+def available_backends():
+    """
+    Return the installed backends, fastest first
+    """
+
+    installed = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+
+    return tuple(backend for backend in BACKENDS if installed[backend])
+
+
+loads = get_loads()
+dumps = get_dumps()
@@ -0,0 +1,62 @@
+"""
+Columnar decoding of the activity details payload (Garmin.get_activity_details)
+
+    details = garmin.get_activity_detail_columns(activity_id)
+    details.metrics["directHeartRate"].max()
+    details.polyline["lat"], details.polyline["lon"]
+"""
+
+from collections import namedtuple
+
+from .support import import_numpy
+
+
+ActivityDetails = namedtuple("ActivityDetails", "metrics polyline")
+
+# Polyline point keys decoded into columns; other keys are ignored
+POLYLINE_KEYS = ("time", "lat", "lon", "altitude", "distanceInMeters", "speed", "cumulativeAscent",
+                 "cumulativeDescent")
+
+
+def decode_metrics(np, data):
+    """
+    Return {descriptor key: float64 array} for 'activityDetailMetrics', missing values as NaN
+    """
+
+    descriptors = data.get("metricDescriptors") or []
+    rows = [row.get("metrics") or [] for row in data.get("activityDetailMetrics") or []]
+    width = max((descriptor["metricsIndex"] for descriptor in descriptors), default=-1) + 1
+
+    if rows and all(len(row) == width for row in rows):
+        # One conversion for the whole table, None becoming NaN
+        table = np.array(rows, dtype=np.float64)
+    else:
+        table = np.full((len(rows), width), np.nan)
+        for index, row in enumerate(rows):
+            table[index, :len(row)] = np.array(row[:width], dtype=np.float64)
+
+    return {descriptor["key"]: table[:, descriptor["metricsIndex"]] for descriptor in descriptors}
+
+
+def decode_polyline(np, data):
+    """
+    Return {key: float64 array} for the points of 'geoPolylineDTO', see POLYLINE_KEYS
+    """
+
+    points = (data.get("geoPolylineDTO") or {}).get("polyline") or []
+    table = np.array([[point.get(key) for key in POLYLINE_KEYS] for point in points], dtype=np.float64)
+    table = table.reshape(len(points), len(POLYLINE_KEYS))
+
+    return {key: table[:, index] for index, key in enumerate(POLYLINE_KEYS)}
+
+
+def decode(data):
+    """
+    Decode a get_activity_details() response into ActivityDetails(metrics, polyline) of
+    named NumPy columns. Timestamps keep Garmin's units (milliseconds since the epoch for
+    'directTimestamp' and polyline 'time').
+    """
+
+    np = import_numpy("Decoding activity details")
+
+    return ActivityDetails(decode_metrics(np, data), decode_polyline(np, data))
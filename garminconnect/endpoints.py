@@ -0,0 +1,240 @@
+"""
+Paths and query parameters of the Garmin Connect endpoints, shared by Garmin and AsyncGarmin
+
+Each function takes the client, for its garmin_connect_* URLs and display_name, and returns
+(path, params) for its modern_rest_client.get_json() call, params being None when there are none:
+
+    path, params = endpoints.steps_data(garmin, "2021-01-01")
+    garmin.modern_rest_client.get_json(path, params=params)
+"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# garmin_connect_* attribute of the download URL of each Garmin.ActivityDownloadFormat member
+DOWNLOAD_URLS = {
+    "ORIGINAL": "garmin_connect_fit_download",
+    "TCX": "garmin_connect_tcx_download",
+    "GPX": "garmin_connect_gpx_download",
+    "KML": "garmin_connect_kml_download",
+    "CSV": "garmin_connect_csv_download",
+}
+
+
+def user_summary(client, cdate):
+    logger.debug('Requesting user summary')
+
+    return f"{client.garmin_connect_daily_summary_url}/{client.display_name}", {"calendarDate": str(cdate)}
+
+
+def check_user_summary(content):
+    """
+    Raise GarminConnectAuthenticationError when the undecoded user summary body 'content' is
+    privacy protected, which Garmin answers instead of a 401 for an expired session.
+    Passed as 'validate' to get_json(), so such a body is never cached and, like a 401, makes
+    Garmin renew the session and replay the request.
+    """
+
+    from . import PRIVACY_PROTECTED, GarminConnectAuthenticationError
+
+    if PRIVACY_PROTECTED.search(content) is not None:
+        raise GarminConnectAuthenticationError("Authentication error")
+
+
+def steps_data(client, cdate):
+    logger.debug("Requesting steps data")
+
+    return f"{client.garmin_connect_user_summary_chart}/{client.display_name}", {'date': str(cdate)}
+
+
+def heart_rate(client, cdate):
+    logger.debug('Requesting heart rate data.')
+
+    return f"{client.garmin_connect_heartrates_daily_url}/{client.display_name}", {'date': str(cdate)}
+
+
+def body_composition(client, start_date, end_date):
+    logger.debug('Requesting body composition.')
+
+    return client.garmin_connect_weight_url, {"startDate": str(start_date), "endDate": str(end_date)}
+
+
+def max_metrics(client, start_date, end_date):
+    logger.debug('Requesting max metrics.')
+
+    return f"{client.garmin_connect_metrics_url}/{start_date}/{end_date}", None
+
+
+def hydration_data(client, cdate):
+    logger.debug('Requesting hydration data.')
+
+    return f"{client.garmin_connect_daily_hydration_url}/{cdate}", None
+
+
+def respiration_data(client, cdate):
+    logger.debug('Requesting respiration data.')
+
+    return f"{client.garmin_connect_daily_respiration_url}/{cdate}", None
+
+
+def spo2_data(client, cdate):
+    logger.debug('Requesting SpO2 data')
+
+    return f"{client.garmin_connect_daily_spo2_url}/{cdate}", None
+
+
+def personal_record(client):
+    logger.debug('Requesting personal records for user.')
+
+    return f"{client.garmin_connect_personal_record_url}/{client.display_name}", None
+
+
+def earned_badges(client):
+    logger.debug('Requesting earned badges for user.')
+
+    return client.garmin_connect_earned_badges_url, None
+
+
+def adhoc_challenges(client, start, limit):
+    logger.debug('Requesting adhoc challenges for user.')
+
+    return client.garmin_connect_adhoc_challenges_url, {"start": str(start), "limit": str(limit)}
+
+
+def badge_challenges(client, start, limit):
+    logger.debug('Requesting badge challenges for user.')
+
+    return client.garmin_connect_badge_challenges_url, {"start": str(start), "limit": str(limit)}
+
+
+def sleep_data(client, cdate):
+    logger.debug('Requesting sleep data.')
+
+    return f"{client.garmin_connect_daily_sleep_url}/{client.display_name}", {
+        "date": str(cdate),
+        "nonSleepBufferMinutes": 60
+    }
+
+
+def stress_data(client, cdate):
+    logger.debug('Requesting stress data.')
+
+    return f"{client.garmin_connect_daily_stress_url}/{cdate}", None
+
+
+def rhr(client, start_date, end_date):
+    logger.debug('Requesting resting heart rate data.')
+
+    return f"{client.garmin_connect_rhr}/{client.display_name}", {
+        "fromDate": str(start_date),
+        "untilDate": str(end_date),
+        "metricId": 60
+    }
+
+
+def devices(client):
+    logger.debug('Requesting devices.')
+
+    return client.garmin_connect_devices_url, None
+
+
+def device_settings(client, device_id):
+    logger.debug('Requesting device settings')
+
+    return f"{client.garmin_connect_device_url}/device-info/settings/{device_id}", None
+
+
+def last_used_device(client):
+    logger.debug("Requesting last used device.")
+
+    return f"{client.garmin_connect_device_url}/mylastused", None
+
+
+def activities(client, start, limit, start_date=None, end_date=None, activity_type=None):
+    """
+    Activities 'start' to 'start' + 'limit', optionally only those between 'start_date' and
+    'end_date' (either may be None for no bound) of 'activity_type'
+    """
+
+    logger.debug("Requesting activities %s to %s.", start, int(start) + int(limit))
+
+    params = {}
+    if start_date is not None:
+        params["startDate"] = str(start_date)
+    if end_date is not None:
+        params["endDate"] = str(end_date)
+    if activity_type:
+        params["activityType"] = str(activity_type)
+    params["start"] = str(start)
+    params["limit"] = str(limit)
+
+    return client.garmin_connect_activities, params
+
+
+def activity_download(client, activity_id, dl_fmt):
+    """
+    Path of the 'dl_fmt' (a Garmin.ActivityDownloadFormat) export of an activity
+    """
+
+    from . import Garmin
+
+    if not isinstance(dl_fmt, Garmin.ActivityDownloadFormat):
+        raise ValueError(f"Unexpected value {dl_fmt} for dl_fmt.")
+
+    return f"{getattr(client, DOWNLOAD_URLS[dl_fmt.name])}/{activity_id}"
+
+
+def activity_splits(client, activity_id):
+    logger.debug("Requesting splits for activity ID %s", activity_id)
+
+    return f"{client.garmin_connect_activity}/{activity_id}/splits", None
+
+
+def activity_split_summaries(client, activity_id):
+    logger.debug("Requesting split summaries for activity ID %s", activity_id)
+
+    return f"{client.garmin_connect_activity}/{activity_id}/split_summaries", None
+
+
+def activity_weather(client, activity_id):
+    logger.debug("Requesting weather for activity ID %s", activity_id)
+
+    return f"{client.garmin_connect_activity}/{activity_id}/weather", None
+
+
+def activity_hr_timezones(client, activity_id):
+    logger.debug("Requesting HR time in zones for activity ID %s", activity_id)
+
+    return f"{client.garmin_connect_activity}/{activity_id}/hrTimeInZones", None
+
+
+def activity_evaluation(client, activity_id):
+    logger.debug("Requesting self-evaluation data for activity ID %s", activity_id)
+
+    return f"{client.garmin_connect_activity}/{activity_id}", None
+
+
+def activity_details(client, activity_id, max_chart, max_poly, seconds=0):
+    """
+    Chart metrics and polyline of an activity, with both limits raised to 'seconds' when given
+    (see activity_seconds())
+    """
+
+    logger.debug("Requesting details for activity ID %s", activity_id)
+
+    return f"{client.garmin_connect_activity}/{activity_id}/details", {
+        "maxChartSize": str(max(max_chart, seconds)),
+        "maxPolylineSize": str(max(max_poly, seconds))
+    }
+
+
+def activity_seconds(evaluation):
+    """
+    Elapsed seconds of an activity (rounded up) from its activity_evaluation() response
+    """
+
+    summary = evaluation.get("summaryDTO") or {}
+
+    return int(summary.get("elapsedDuration") or 0) + 1
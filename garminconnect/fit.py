@@ -0,0 +1,374 @@
+"""
+Streaming decoder for FIT activity files, as returned by ActivityDownloadFormat.ORIGINAL downloads
+
+    blob = garmin.download_activity(activity_id, Garmin.ActivityDownloadFormat.ORIGINAL)
+    records = fit.read_records(blob)
+    records["heart_rate"].mean()
+
+Only the message framing is walked in Python; the record messages found in each chunk are
+gathered per definition and decoded with one structured NumPy view, so the cost per
+per-second record is a few list appends.
+"""
+
+import struct
+
+from .support import import_numpy, open_source
+
+
+# FIT timestamps count seconds from 1989-12-31T00:00:00Z
+FIT_EPOCH = 631065600
+
+RECORD_MESSAGE = 20
+TIMESTAMP_FIELD = 253
+
+CHUNK_SIZE = 256 * 1024
+
+# base type number: (numpy type, invalid value; None for floats where NaN is invalid)
+BASE_TYPES = {
+    0: ("u1", 0xFF),
+    1: ("i1", 0x7F),
+    2: ("u1", 0xFF),
+    3: ("i2", 0x7FFF),
+    4: ("u2", 0xFFFF),
+    5: ("i4", 0x7FFFFFFF),
+    6: ("u4", 0xFFFFFFFF),
+    8: ("f4", None),
+    9: ("f8", None),
+    10: ("u1", 0),
+    11: ("u2", 0),
+    12: ("u4", 0),
+    13: ("u1", 0xFF),
+    14: ("i8", 0x7FFFFFFFFFFFFFFF),
+    15: ("u8", 0xFFFFFFFFFFFFFFFF),
+    16: ("u8", 0),
+}
+
+SEMICIRCLES = 2 ** 31 / 180.0
+
+# record field number: (column, scale, offset); a column's value is raw / scale - offset
+RECORD_FIELDS = {
+    0: ("position_lat", SEMICIRCLES, 0),
+    1: ("position_long", SEMICIRCLES, 0),
+    2: ("altitude", 5, 500),
+    3: ("heart_rate", 1, 0),
+    4: ("cadence", 1, 0),
+    5: ("distance", 100, 0),
+    6: ("speed", 1000, 0),
+    7: ("power", 1, 0),
+    73: ("speed", 1000, 0),
+    78: ("altitude", 5, 500),
+}
+
+# Enhanced fields win over their 16 bit counterparts when a message has both
+ENHANCED_FIELDS = {73: 6, 78: 2}
+
+COLUMNS = ("timestamp", "position_lat", "position_long", "altitude", "heart_rate", "cadence", "distance", "speed",
+           "power")
+
+
+class FitError(Exception):
+    """
+    Raised for data which is not a valid FIT file
+    """
+
+
+def open_fit(source):
+    """
+    Context manager yielding a binary stream of the FIT data in 'source': bytes, a path or a
+    binary file object, either of a FIT file or of a zip archive holding one, see
+    garminconnect.support.open_source()
+    """
+
+    return open_source(source, (".fit",), FitError)
+
+
+class _Definition:
+    """
+    Layout of the data messages of one local message type
+    """
+
+    def __init__(self, buf, pos, header):
+        self.endian = ">" if buf[pos + 2] else "<"
+        self.global_num = struct.unpack_from(self.endian + "H", buf, pos + 3)[0]
+        self.fields = []
+        self.base_types = {}
+        self.timestamp_offset = None
+
+        offset = 0
+        field_pos = pos + 6
+        for _ in range(buf[pos + 5]):
+            number, size, base_type = buf[field_pos], buf[field_pos + 1], buf[field_pos + 2] & 0x1F
+            if number == TIMESTAMP_FIELD and size == 4:
+                self.timestamp_offset = offset
+            self.fields.append((number, offset, size, base_type))
+            self.base_types[number] = base_type
+            offset += size
+            field_pos += 3
+
+        if header & 0x20:
+            for _ in range(buf[field_pos]):
+                offset += buf[field_pos + 2]
+                field_pos += 3
+
+        self.size = offset
+        self.is_record = self.global_num == RECORD_MESSAGE
+        # Record messages pending decoding in the current chunk: body offsets and
+        # timestamps of compressed timestamp headers (-1 for normal headers)
+        self.offsets = []
+        self.timestamps = []
+        self._dtype = None
+
+
+    def dtype(self, np):
+        """
+        Structured dtype picking the known record fields out of a message body
+        """
+
+        if self._dtype is None:
+            names, formats, offsets = [], [], []
+            for number, offset, size, base_type in self.fields:
+                if number != TIMESTAMP_FIELD and number not in RECORD_FIELDS or base_type not in BASE_TYPES:
+                    continue
+                numpy_type = BASE_TYPES[base_type][0]
+                if int(numpy_type[1]) != size:
+                    continue
+                names.append(f"f{number}")
+                formats.append(self.endian + numpy_type)
+                offsets.append(offset)
+            self._dtype = np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": self.size})
+
+        return self._dtype
+
+
+class FitDecoder:
+    """
+    Incremental FIT decoder: feed() it bytes in any chunking and it returns the record
+    messages completed so far as NumPy columns (see COLUMNS). Chained FIT files are
+    followed; CRCs are not verified.
+    """
+
+    def __init__(self):
+        """
+        """
+
+        self.definitions = {}
+        self.last_timestamp = 0
+
+        # Bytes left in the data section of the current file, None while expecting a file header
+        self._remaining = None
+        self._buffer = b""
+        self._timestamp_ref = None
+        # Replaced definitions which still have record messages queued
+        self._pending = set()
+
+
+    def feed(self, data):
+        """
+        Consume 'data' and return the columns of the record messages it completed, or None
+        """
+
+        buf = self._buffer + data if self._buffer else bytes(data)
+        pos = self._scan(buf)
+        self._resolve_timestamp(buf)
+        self._buffer = buf[pos:]
+
+        return self._decode(buf)
+
+
+    def close(self):
+        """
+        Check the data ended on a message boundary
+        """
+
+        if self._buffer or self._remaining:
+            raise FitError("The FIT data is truncated.")
+
+
+    def _scan(self, buf):
+        """
+        Walk the messages in 'buf', queueing record messages on their definition.
+        Return the offset of the first incomplete message.
+        """
+
+        definitions = self.definitions
+        end = len(buf)
+        pos = 0
+
+        while pos < end:
+            if self._remaining is None:
+                size = buf[pos]
+                if end - pos < size:
+                    break
+                if size < 12 or buf[pos + 8:pos + 12] != b".FIT":
+                    raise FitError("Missing FIT file header.")
+                self._remaining = struct.unpack_from("<I", buf, pos + 4)[0]
+                self._pending.update(definitions.values())
+                definitions = self.definitions = {}
+                pos += size
+                continue
+
+            if self._remaining == 0:
+                # File CRC, possibly followed by a chained file
+                if end - pos < 2:
+                    break
+                self._remaining = None
+                pos += 2
+                continue
+
+            header = buf[pos]
+            if header & 0x80:
+                definition = definitions.get((header >> 5) & 0x03)
+                if definition is None:
+                    raise FitError(f"Data message for undefined local type at byte {pos}.")
+                length = 1 + definition.size
+                if end - pos < length:
+                    break
+                self._resolve_timestamp(buf)
+                last = self.last_timestamp
+                self.last_timestamp = last + (((header & 0x1F) - last) & 0x1F)
+                if definition.is_record:
+                    definition.offsets.append(pos + 1)
+                    definition.timestamps.append(self.last_timestamp)
+
+            elif header & 0x40:
+                if end - pos < 6:
+                    break
+                length = 6 + 3 * buf[pos + 5]
+                if header & 0x20:
+                    if end - pos < length + 1:
+                        break
+                    length += 1 + 3 * buf[pos + length]
+                if end - pos < length:
+                    break
+                replaced = definitions.get(header & 0x0F)
+                if replaced is not None:
+                    self._pending.add(replaced)
+                definitions[header & 0x0F] = _Definition(buf, pos, header)
+
+            else:
+                definition = definitions.get(header & 0x0F)
+                if definition is None:
+                    raise FitError(f"Data message for undefined local type at byte {pos}.")
+                length = 1 + definition.size
+                if end - pos < length:
+                    break
+                if definition.is_record:
+                    definition.offsets.append(pos + 1)
+                    definition.timestamps.append(-1)
+                if definition.timestamp_offset is not None:
+                    self._timestamp_ref = (pos + 1, definition)
+
+            if length > self._remaining:
+                raise FitError(f"Message at byte {pos} overruns the FIT data section.")
+            self._remaining -= length
+            pos += length
+
+        return pos
+
+
+    def _resolve_timestamp(self, buf):
+        """
+        Read the timestamp of the latest timestamped message, which compressed timestamp headers count from
+        """
+
+        if self._timestamp_ref is None:
+            return
+
+        pos, definition = self._timestamp_ref
+        self._timestamp_ref = None
+        value = struct.unpack_from(definition.endian + "I", buf, pos + definition.timestamp_offset)[0]
+        if value != 0xFFFFFFFF:
+            self.last_timestamp = value
+
+
+    def _decode(self, buf):
+        np = import_numpy("The FIT decoder")
+
+        data = np.frombuffer(buf, dtype=np.uint8)
+        parts = []
+        for definition in set(self.definitions.values()) | set(self._pending):
+            if not definition.offsets:
+                continue
+            parts.append(self._decode_definition(np, data, definition))
+            definition.offsets = []
+            definition.timestamps = []
+        self._pending = set()
+
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0][1]
+
+        order = np.argsort(np.concatenate([offsets for offsets, _ in parts]), kind="stable")
+
+        return {name: np.concatenate([columns[name] for _, columns in parts])[order] for name in COLUMNS}
+
+
+    def _decode_definition(self, np, data, definition):
+        offsets = np.asarray(definition.offsets, dtype=np.int64)
+        rows = data[offsets[:, None] + np.arange(definition.size)]
+        messages = rows.view(definition.dtype(np)).reshape(len(offsets))
+        present = set(messages.dtype.names)
+
+        timestamps = np.asarray(definition.timestamps, dtype=np.int64)
+        if "f253" in present:
+            raw = messages["f253"].astype(np.int64)
+            timestamps = np.where((timestamps < 0) & (raw != 0xFFFFFFFF), raw, timestamps)
+        columns = {
+            "timestamp": np.where(timestamps >= 0, timestamps + FIT_EPOCH, np.iinfo(np.int64).min).astype("datetime64[s]"),
+        }
+
+        superseded = {regular for enhanced, regular in ENHANCED_FIELDS.items() if f"f{enhanced}" in present}
+        for number, (name, scale, offset) in RECORD_FIELDS.items():
+            field = f"f{number}"
+            if field not in present or number in superseded:
+                continue
+            raw = messages[field]
+            invalid = BASE_TYPES[definition.base_types[number]][1]
+            values = raw.astype(np.float64)
+            if invalid is None:
+                values[~np.isfinite(values)] = np.nan
+            else:
+                values[raw == invalid] = np.nan
+            columns[name] = values / scale - offset
+
+        for name in COLUMNS:
+            if name not in columns:
+                columns[name] = np.full(len(offsets), np.nan)
+
+        return offsets, columns
+
+
+def iter_records(source, chunk_size=CHUNK_SIZE):
+    """
+    Stream the record messages of a FIT file (see open_fit() for 'source') as dicts of
+    NumPy columns, one per chunk of 'chunk_size' bytes; memory use is bounded by the chunk
+    """
+
+    decoder = FitDecoder()
+    with open_fit(source) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            columns = decoder.feed(chunk)
+            if columns is not None:
+                yield columns
+
+    decoder.close()
+
+
+def read_records(source, chunk_size=CHUNK_SIZE):
+    """
+    Decode all record messages of a FIT file into {column: NumPy array} (see COLUMNS).
+    'timestamp' is datetime64[s] (UTC), latitude and longitude are degrees, altitude meters,
+    distance meters and speed m/s; missing values are NaN (NaT for timestamps).
+    """
+
+    np = import_numpy("The FIT decoder")
+
+    batches = list(iter_records(source, chunk_size))
+    if not batches:
+        return {name: np.empty(0, dtype="datetime64[s]" if name == "timestamp" else np.float64) for name in COLUMNS}
+
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in COLUMNS}
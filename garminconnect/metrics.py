@@ -0,0 +1,224 @@
+"""
+Per endpoint request metrics for ApiClient
+"""
+
+import math
+import threading
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus style) with quantile estimates
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        """
+
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+    def observe(self, value):
+        """
+        """
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+    def quantile(self, q):
+        """
+        Estimate the q-quantile by linear interpolation inside its bucket
+        """
+
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+
+        return self.max
+
+
+class EndpointStats:
+    """
+    Counters for a single logical endpoint
+    """
+
+    def __init__(self):
+        """
+        """
+
+        self.latency = Histogram()
+        self.decode = Histogram()
+        self.statuses = {}
+        self.bytes = 0
+        self.retries = 0
+
+
+    @property
+    def requests(self):
+        return self.latency.count
+
+
+    def snapshot(self):
+        """
+        """
+
+        return {
+            "requests": self.requests,
+            "p50": self.latency.quantile(0.5),
+            "p95": self.latency.quantile(0.95),
+            "p99": self.latency.quantile(0.99),
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "decode_seconds": self.decode.sum,
+            "statuses": dict(self.statuses),
+        }
+
+
+def status_class(status):
+    """
+    Group a status code into '2xx', '3xx', '4xx', '429', '5xx' ('error' when there was no response)
+    """
+
+    if status is None:
+        return "error"
+    if status == 429:
+        return "429"
+
+    return f"{status // 100}xx"
+
+
+class MetricsRegistry:
+    """
+    In-process registry of request metrics per logical endpoint.
+
+    Pass one as Garmin(..., metrics=registry) (or ApiClient.metrics); any object with the same
+    observe_request/observe_retry/observe_decode methods can be plugged in instead.
+    """
+
+    def __init__(self, prefix="garminconnect"):
+        """
+        """
+
+        self.prefix = prefix
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+
+    def _endpoint(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = EndpointStats()
+
+        return stats
+
+
+    def observe_request(self, endpoint, status, seconds, nbytes=0):
+        """
+        Record one HTTP round-trip; 'status' is None when no response was received
+        """
+
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats.latency.observe(seconds)
+            key = status_class(status)
+            stats.statuses[key] = stats.statuses.get(key, 0) + 1
+            stats.bytes += nbytes
+
+
+    def observe_retry(self, endpoint):
+        """
+        """
+
+        with self._lock:
+            self._endpoint(endpoint).retries += 1
+
+
+    def observe_decode(self, endpoint, seconds):
+        """
+        """
+
+        with self._lock:
+            self._endpoint(endpoint).decode.observe(seconds)
+
+
+    def snapshot(self):
+        """
+        Return {endpoint: {requests, p50, p95, p99, bytes, retries, decode_seconds, statuses}}
+        """
+
+        with self._lock:
+            return {endpoint: stats.snapshot() for endpoint, stats in sorted(self.endpoints.items())}
+
+
+    def reset(self):
+        """
+        """
+
+        with self._lock:
+            self.endpoints.clear()
+
+
+    def to_prometheus(self):
+        """
+        Render the metrics in the Prometheus text exposition format
+        """
+
+        prefix = self.prefix
+        lines = []
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+
+            lines.append(f"# HELP {prefix}_requests_total HTTP requests by endpoint and status class.")
+            lines.append(f"# TYPE {prefix}_requests_total counter")
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            for name, attribute, help_text in (
+                    ("request_seconds", "latency", "HTTP request latency."),
+                    ("decode_seconds", "decode", "JSON decode time.")):
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                for endpoint, stats in endpoints:
+                    histogram = getattr(stats, attribute)
+                    if not histogram.count:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else repr(bound)
+                        lines.append(f'{prefix}_{name}_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                    lines.append(f'{prefix}_{name}_sum{{endpoint="{endpoint}"}} {histogram.sum}')
+                    lines.append(f'{prefix}_{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+            for name, attribute, help_text in (
+                    ("response_bytes_total", "bytes", "Response body bytes."),
+                    ("retries_total", "retries", "Retried requests.")):
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for endpoint, stats in endpoints:
+                    lines.append(f'{prefix}_{name}{{endpoint="{endpoint}"}} {getattr(stats, attribute)}')
+
+        return "\n".join(lines) + "\n"
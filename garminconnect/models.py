@@ -0,0 +1,188 @@
+"""
+Compact typed records for activity summaries and daily user summaries
+
+    for activity in garmin.iter_activities("2015-01-01", "2021-12-31", model=True):
+        print(activity.activity_id, activity.distance, activity.activity_type["typeKey"])
+
+A model keeps the frequently used scalars in __slots__ and the full payload as zlib
+compressed JSON. Nested objects (see Model.nested) are decoded from it once, on the first
+access to any of them, into slots of their own; other keys are decoded on every access.
+"""
+
+import zlib
+
+from . import codec
+
+
+class Model:
+    """
+    Base of the typed records; subclasses map payload keys to slots in 'fields'
+    """
+
+    __slots__ = ("_payload",)
+
+    # payload key: attribute
+    fields = {}
+    # payload key: attribute, for nested objects left in the payload until first accessed
+    nested = {}
+
+
+    def __init__(self, **values):
+        """
+        """
+
+        for attribute in self.fields.values():
+            setattr(self, attribute, values.get(attribute))
+        for attribute in self.nested.values():
+            setattr(self, attribute, values.get(attribute))
+        self._payload = None
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a record from a decoded payload
+        """
+
+        model = cls.__new__(cls)
+        for key, attribute in cls.fields.items():
+            setattr(model, attribute, data.get(key))
+        model._payload = zlib.compress(codec.dumps(data), 1)
+
+        return model
+
+
+    @classmethod
+    def from_list(cls, items):
+        """
+        """
+
+        return [cls.from_dict(item) for item in items]
+
+
+    @property
+    def raw(self):
+        """
+        The complete payload, decoded anew on every access
+        """
+
+        if self._payload is None:
+            return {key: getattr(self, attribute) for key, attribute in {**self.fields, **self.nested}.items()}
+
+        return codec.loads(zlib.decompress(self._payload))
+
+
+    def __getattr__(self, name):
+        """
+        Fill the nested slots from the payload on the first access to one of them; later
+        accesses read the slots directly
+        """
+
+        if name not in self.nested.values():
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+        data = self.raw
+        for key, attribute in self.nested.items():
+            setattr(self, attribute, data.get(key))
+
+        return getattr(self, name)
+
+
+    def __getitem__(self, key):
+        """
+        Dict style access by payload key, for code written against the plain dicts
+        """
+
+        attribute = self.fields.get(key) or self.nested.get(key)
+        if attribute is not None:
+            return getattr(self, attribute)
+
+        return self.raw[key]
+
+
+    def get(self, key, default=None):
+        """
+        """
+
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+
+        return all(getattr(self, attribute) == getattr(other, attribute) for attribute in self.fields.values())
+
+
+    def __hash__(self):
+        return hash((type(self),) + tuple(getattr(self, attribute) for attribute in self.fields.values()))
+
+
+    def __repr__(self):
+        values = ", ".join(f"{attribute}={getattr(self, attribute)!r}" for attribute in list(self.fields.values())[:3])
+        return f"{type(self).__name__}({values}, ...)"
+
+
+ACTIVITY_FIELDS = {
+    "activityId": "activity_id",
+    "activityName": "activity_name",
+    "startTimeLocal": "start_time_local",
+    "startTimeGMT": "start_time_gmt",
+    "distance": "distance",
+    "duration": "duration",
+    "elapsedDuration": "elapsed_duration",
+    "movingDuration": "moving_duration",
+    "elevationGain": "elevation_gain",
+    "elevationLoss": "elevation_loss",
+    "averageSpeed": "average_speed",
+    "maxSpeed": "max_speed",
+    "averageHR": "average_hr",
+    "maxHR": "max_hr",
+    "calories": "calories",
+    "steps": "steps",
+}
+
+
+class Activity(Model):
+    """
+    Activity summary as returned by get_activities() and iter_activities()
+    """
+
+    __slots__ = tuple(ACTIVITY_FIELDS.values()) + ("activity_type", "event_type")
+
+    fields = ACTIVITY_FIELDS
+    nested = {"activityType": "activity_type", "eventType": "event_type"}
+
+
+DAILY_SUMMARY_FIELDS = {
+    "calendarDate": "calendar_date",
+    "totalSteps": "total_steps",
+    "dailyStepGoal": "daily_step_goal",
+    "totalDistanceMeters": "total_distance_meters",
+    "totalKilocalories": "total_kilocalories",
+    "activeKilocalories": "active_kilocalories",
+    "restingHeartRate": "resting_heart_rate",
+    "minHeartRate": "min_heart_rate",
+    "maxHeartRate": "max_heart_rate",
+    "averageStressLevel": "average_stress_level",
+    "maxStressLevel": "max_stress_level",
+    "bodyBatteryHighestValue": "body_battery_highest_value",
+    "bodyBatteryLowestValue": "body_battery_lowest_value",
+    "floorsAscended": "floors_ascended",
+    "moderateIntensityMinutes": "moderate_intensity_minutes",
+    "vigorousIntensityMinutes": "vigorous_intensity_minutes",
+    "sleepingSeconds": "sleeping_seconds",
+}
+
+
+class DailySummary(Model):
+    """
+    Daily user summary as returned by get_user_summary()
+    """
+
+    __slots__ = tuple(DAILY_SUMMARY_FIELDS.values())
+
+    fields = DAILY_SUMMARY_FIELDS
@@ -0,0 +1,259 @@
+"""
+Client pool for syncing many Garmin Connect accounts
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from concurrent.futures import Future
+
+from . import Garmin, _clone_session, _new_session, _resize_connection_pool
+from .ratelimit import RateLimiter
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Account:
+    def __init__(self, key, garmin, weight):
+        self.key = key
+        self.garmin = garmin
+        self.weight = weight
+        self.jobs = collections.deque()
+        self.finish_tag = 0.0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy = 0.0
+
+
+class GarminPool:
+    """
+    Many authenticated Garmin accounts served by one set of worker threads.
+
+    All accounts share one scraper's connection pool (at most 'pool_maxsize' connections per
+    host) and one RateLimiter, so the global request budget holds no matter how many accounts
+    are busy. Calls queued with submit() are dispatched weighted-fair: an account with weight
+    2 gets twice the share of a backlogged account with weight 1, and equal weights give
+    round-robin.
+
+        with GarminPool(max_workers=16, rate=10) as pool:
+            for key, session_data in accounts.items():
+                pool.add_account(key, email, password, session_data=session_data)
+            pool.login_all()
+            futures = pool.map("get_user_summary", "2021-05-01")
+    """
+
+    def __init__(self, max_workers=16, rate=10.0, burst=20, pool_maxsize=None, rate_limiter=None):
+        """
+        """
+
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or RateLimiter(rate=rate, burst=burst, max_concurrency=max_workers)
+
+        self.template_session = _new_session()
+        _resize_connection_pool(self.template_session, pool_maxsize or max_workers, block=True)
+
+        self.accounts = {}
+
+        self._cond = threading.Condition()
+        self._virtual_time = 0.0
+        self._workers = []
+        self._closed = False
+        self._started = time.monotonic()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def add_account(self, key, email, password, session_data=None, weight=1, **kwargs):
+        """
+        Register an account under 'key' and return its Garmin client (not logged in yet).
+        Extra keyword arguments are passed to Garmin.
+        """
+
+        if weight <= 0:
+            raise ValueError(f"Unexpected value {weight} for weight.")
+
+        garmin = Garmin(email, password, session_data=session_data, session=_clone_session(self.template_session),
+                        rate_limiter=self.rate_limiter, **kwargs)
+        with self._cond:
+            if key in self.accounts:
+                raise ValueError(f"Account {key} is already in the pool.")
+            self.accounts[key] = _Account(key, garmin, weight)
+
+        return garmin
+
+
+    def remove_account(self, key):
+        """
+        Remove an account, cancelling its queued calls
+        """
+
+        with self._cond:
+            account = self.accounts.pop(key)
+            jobs = list(account.jobs)
+            account.jobs.clear()
+
+        for future, _, _, _ in jobs:
+            future.cancel()
+
+
+    def submit(self, key, method, *args, **kwargs):
+        """
+        Queue garmin.<method>(*args, **kwargs) for account 'key' and return a Future.
+        'method' is the name of a Garmin method or a callable taking the Garmin client first.
+        """
+
+        func = method if callable(method) else getattr(Garmin, method)
+        future = Future()
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Cannot submit to a closed pool.")
+            account = self.accounts[key]
+            if not account.jobs:
+                # An account becoming busy starts at the current virtual time, idle time earns no credit.
+                account.finish_tag = max(account.finish_tag, self._virtual_time)
+            account.jobs.append((future, func, args, kwargs))
+            account.submitted += 1
+            self._start_workers()
+            self._cond.notify()
+
+        return future
+
+
+    def map(self, method, *args, keys=None, **kwargs):
+        """
+        Submit the same call for every account (or those in 'keys'), returning {key: Future}
+        """
+
+        if keys is None:
+            keys = list(self.accounts)
+
+        return {key: self.submit(key, method, *args, **kwargs) for key in keys}
+
+
+    def login_all(self):
+        """
+        Log in every account, returning {key: result} where a failed login holds its exception
+        """
+
+        results = {}
+        for key, future in self.map("login").items():
+            try:
+                results[key] = future.result()
+            except Exception as err:
+                logger.debug("Login of %s failed: %s", key, err)
+                results[key] = err
+
+        return results
+
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"GarminPool-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+
+    def _next_job(self):
+        """
+        Pop the queued call of the backlogged account with the smallest virtual finish tag
+        """
+
+        chosen = None
+        for account in self.accounts.values():
+            if account.jobs and (chosen is None or account.finish_tag < chosen.finish_tag):
+                chosen = account
+        if chosen is None:
+            return None
+
+        self._virtual_time = chosen.finish_tag
+        chosen.finish_tag += 1.0 / chosen.weight
+
+        return chosen, chosen.jobs.popleft()
+
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._closed:
+                    self._cond.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+
+            account, (future, func, args, kwargs) = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            start = time.monotonic()
+            try:
+                result = func(account.garmin, *args, **kwargs)
+            except BaseException as err:
+                future.set_exception(err)
+                failed = True
+            else:
+                future.set_result(result)
+                failed = False
+
+            with self._cond:
+                account.busy += time.monotonic() - start
+                account.completed += 1
+                account.failed += failed
+
+
+    def stats(self):
+        """
+        Return aggregate and per account call counts, throughput and the rate limiter state
+        """
+
+        with self._cond:
+            elapsed = time.monotonic() - self._started
+            accounts = {
+                account.key: {
+                    "weight": account.weight,
+                    "queued": len(account.jobs),
+                    "submitted": account.submitted,
+                    "completed": account.completed,
+                    "failed": account.failed,
+                    "busy_seconds": account.busy,
+                }
+                for account in self.accounts.values()
+            }
+
+        completed = sum(account["completed"] for account in accounts.values())
+
+        return {
+            "elapsed_seconds": elapsed,
+            "queued": sum(account["queued"] for account in accounts.values()),
+            "completed": completed,
+            "failed": sum(account["failed"] for account in accounts.values()),
+            "calls_per_second": completed / elapsed if elapsed > 0 else 0.0,
+            "rate_limiter": self.rate_limiter.stats(),
+            "accounts": accounts,
+        }
+
+
+    def close(self, wait=True):
+        """
+        Stop the workers once the queued calls are done
+        """
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+        if wait:
+            for worker in self._workers:
+                worker.join()
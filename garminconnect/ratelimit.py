@@ -0,0 +1,182 @@
+"""
+Client side throttling helpers
+"""
+
+import datetime
+import email.utils
+import logging
+import random
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket refilled at 'rate' tokens per second up to 'burst' tokens.
+
+    consume() reserves its tokens immediately and sleeps off any deficit, so callers are
+    served in arrival order and a request larger than the burst is still allowed through.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        """
+
+        if rate <= 0:
+            raise ValueError(f"Unexpected value {rate} for rate.")
+
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def consume(self, amount=1):
+        """
+        Take 'amount' tokens, blocking until they are available. Returns the time slept.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+
+class RateLimiter:
+    """
+    Request throttling for one or more ApiClients.
+
+    Requests are paced by a token bucket ('rate' requests per second, bursts of 'burst') and
+    the number of requests in flight is adapted AIMD style: it is halved whenever the server
+    answers 429 and grows back by about one slot per window of successful requests, between
+    'min_concurrency' and 'max_concurrency'. Throttled requests (429/503) are retried up to
+    'max_retries' times with exponential backoff and full jitter, honouring Retry-After; delays
+    are capped at 'backoff_max' seconds.
+    """
+
+    retry_statuses = (429, 503)
+
+    def __init__(self, rate=5.0, burst=10, max_concurrency=8, min_concurrency=1, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0):
+        """
+        """
+
+        if min_concurrency < 1 or max_concurrency < min_concurrency:
+            raise ValueError(f"Unexpected concurrency bounds {min_concurrency}..{max_concurrency}.")
+
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self.retries = 0
+
+        self._cond = threading.Condition()
+
+
+    def acquire(self):
+        """
+        Block until a request may be sent
+        """
+
+        with self._cond:
+            while self.in_flight >= int(self.concurrency):
+                self._cond.wait()
+            self.in_flight += 1
+
+        if self.bucket is not None:
+            self.bucket.consume()
+
+
+    def release(self, throttled=False):
+        """
+        Return the slot taken by acquire(), adapting the concurrency to the outcome
+        """
+
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.concurrency = max(float(self.min_concurrency), self.concurrency / 2)
+                logger.debug("Throttled, concurrency lowered to %d.", int(self.concurrency))
+            else:
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+            self._cond.notify_all()
+
+
+    def should_retry(self, status_code, attempt):
+        """
+        """
+
+        return status_code in self.retry_statuses and attempt < self.max_retries
+
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Return the delay (in seconds) before retry number 'attempt' (starting at 0), at most 'backoff_max'
+        also when the server asks for a longer Retry-After
+        """
+
+        delay = _parse_retry_after(retry_after)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        else:
+            delay = min(self.backoff_max, delay)
+
+        with self._cond:
+            self.retries += 1
+
+        return delay
+
+
+    def stats(self):
+        """
+        """
+
+        with self._cond:
+            return {
+                "concurrency": int(self.concurrency),
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+                "retries": self.retries,
+            }
+
+
+def _parse_retry_after(value):
+    """
+    Return the delay in seconds from a Retry-After header (delta-seconds or HTTP-date), or None
+    """
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
@@ -0,0 +1,49 @@
+"""
+Helpers shared by the NumPy based decoders (fit, xmltrack, details, timeseries)
+"""
+
+import contextlib
+import io
+import os
+import zipfile
+
+
+def import_numpy(feature):
+    """
+    Import NumPy, which is optional, naming 'feature' in the error when it is missing
+    """
+
+    try:
+        import numpy
+    except ImportError as err:
+        raise ImportError(f"{feature} requires the 'numpy' package.") from err
+
+    return numpy
+
+
+@contextlib.contextmanager
+def open_source(source, suffixes, error=ValueError):
+    """
+    Context manager yielding a binary stream of 'source': bytes, a path or a binary file object,
+    either of a document or of a zip archive holding one whose name ends with one of 'suffixes'
+    (read from the archive without extracting it, 'error' is raised when there is none).
+    Only what is opened here is closed on exit; a file object passed in is left open.
+    """
+
+    with contextlib.ExitStack() as stack:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        elif isinstance(source, (str, os.PathLike)):
+            source = stack.enter_context(open(source, "rb"))
+
+        if source.seekable() and zipfile.is_zipfile(source):
+            source.seek(0)
+            archive = stack.enter_context(zipfile.ZipFile(source))
+            names = [name for name in archive.namelist() if name.lower().endswith(suffixes)]
+            if not names:
+                raise error(f"The zip archive holds no {' or '.join(suffixes)} file.")
+            source = stack.enter_context(archive.open(names[0]))
+        elif source.seekable():
+            source.seek(0)
+
+        yield source
@@ -0,0 +1,167 @@
+"""
+Incremental activity sync with a local SQLite store
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class ActivitySync:
+    """
+    Mirror the activity summaries of a logged in Garmin account into a local store.
+
+    The activity list is returned newest first, so each sync() only pages until it reaches
+    an activity that is already stored (or one older than the high-watermark of the previous
+    run). An up to date account therefore costs a single request per sync.
+    """
+
+    def __init__(self, garmin, path=":memory:", page_size=20):
+        """
+        """
+
+        self.garmin = garmin
+        self.path = path
+        self.page_size = page_size
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS activities ("
+            "owner TEXT, activity_id INTEGER, start_time TEXT, payload TEXT, "
+            "PRIMARY KEY (owner, activity_id))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "owner TEXT PRIMARY KEY, activity_id INTEGER, start_time TEXT, synced_at REAL)"
+        )
+
+
+    @property
+    def owner(self):
+        if self.garmin.display_name is None:
+            raise ValueError("Garmin client must be logged in before syncing activities.")
+
+        return self.garmin.display_name
+
+
+    def watermark(self):
+        """
+        Return the newest synced activity as {'activity_id', 'start_time', 'synced_at'}, or None
+        """
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT activity_id, start_time, synced_at FROM watermarks WHERE owner = ?", (self.owner,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {"activity_id": row[0], "start_time": row[1], "synced_at": row[2]}
+
+
+    def sync(self, full=False):
+        """
+        Fetch activities newer than the stored ones and return them (newest first).
+        With 'full' the whole list is walked, picking up activities uploaded out of order.
+        """
+
+        owner = self.owner
+        watermark = None if full else self.watermark()
+        new = []
+        start = 0
+        request_count = 0
+
+        while True:
+            page = self.garmin.get_activities(start, self.page_size)
+            request_count += 1
+            if not page:
+                break
+
+            known = self._known_ids(owner, [activity["activityId"] for activity in page])
+            reached = False
+            for activity in page:
+                if activity["activityId"] in known:
+                    if full:
+                        continue
+                    reached = True
+                    break
+                if watermark is not None and activity.get("startTimeGMT", "") < watermark["start_time"]:
+                    reached = True
+                    break
+                new.append(activity)
+
+            if reached or len(page) < self.page_size:
+                break
+            start += self.page_size
+
+        self._store(owner, new)
+        logger.debug("Synced %d new activities for %s in %d requests.", len(new), owner, request_count)
+
+        return new
+
+
+    def activities(self):
+        """
+        Return all stored activity summaries for the account, newest first
+        """
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM activities WHERE owner = ? ORDER BY start_time DESC, activity_id DESC",
+                (self.owner,)
+            ).fetchall()
+
+        return [json.loads(row[0]) for row in rows]
+
+
+    def _known_ids(self, owner, activity_ids):
+        placeholders = ", ".join("?" * len(activity_ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT activity_id FROM activities WHERE owner = ? AND activity_id IN ({placeholders})",
+                [owner, *activity_ids]
+            ).fetchall()
+
+        return {row[0] for row in rows}
+
+
+    def _store(self, owner, activities):
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO activities VALUES (?, ?, ?, ?)",
+                    [
+                        (owner, activity["activityId"], activity.get("startTimeGMT", ""), json.dumps(activity))
+                        for activity in activities
+                    ]
+                )
+                newest = self._db.execute(
+                    "SELECT activity_id, start_time FROM activities WHERE owner = ? "
+                    "ORDER BY start_time DESC, activity_id DESC LIMIT 1", (owner,)
+                ).fetchone()
+                if newest is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                        (owner, newest[0], newest[1], time.time())
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+
+    def close(self):
+        """
+        """
+
+        with self._lock:
+            self._db.close()
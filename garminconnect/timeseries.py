@@ -0,0 +1,207 @@
+"""
+Columnar NumPy time series for the intraday [timestamp, value] arrays of the wellness endpoints
+
+    series = garmin.get_timeseries("heart_rate", "2021-01-01", "2021-01-31")
+    hourly = series.resample(3600)
+    daily = series.daily("max")
+"""
+
+from .support import import_numpy
+
+
+# metric: (Garmin daily metric fetched, response key, value index, values below this are nulls)
+SERIES = {
+    "heart_rate": ("heart_rate", "heartRateValues", 1, None),
+    "stress": ("stress_data", "stressValuesArray", 1, 0),
+    "body_battery": ("stress_data", "bodyBatteryValuesArray", 2, 0),
+    "respiration": ("respiration_data", "respirationValuesArray", 1, 0),
+    "spo2": ("spo2_data", "spO2HourlyAverages", 1, 0),
+}
+
+AGGREGATES = ("mean", "min", "max", "sum", "count")
+
+DAY_SECONDS = 86400
+
+
+class TimeSeries:
+    """
+    Contiguous timestamp and value columns of one metric.
+
+    'timestamps' is a datetime64[ms] array (UTC) and 'values' a float32 numpy.ma.MaskedArray
+    of the same length in which missing or invalid samples are masked.
+    """
+
+    def __init__(self, timestamps, values, name=None):
+        """
+        """
+
+        np = import_numpy("TimeSeries")
+
+        self.timestamps = np.asarray(timestamps, dtype="datetime64[ms]")
+        self.values = np.ma.asarray(values, dtype=np.float32)
+        self.name = name
+
+        if len(self.timestamps) != len(self.values):
+            raise ValueError(f"Unexpected length {len(self.values)} of values for {len(self.timestamps)} timestamps.")
+
+
+    @classmethod
+    def from_pairs(cls, pairs, name=None, value_index=1, null_below=None):
+        """
+        Build a series from Garmin [timestamp ms, value, ...] rows; None values, and with 'null_below'
+        values below it (Garmin uses -1/-2 for "no reading"), are masked
+        """
+
+        np = import_numpy("TimeSeries")
+
+        pairs = pairs or []
+        count = len(pairs)
+        timestamps = np.fromiter((row[0] for row in pairs), dtype=np.int64, count=count)
+        # A float dtype turns None into NaN in the same pass
+        values = np.array([row[value_index] for row in pairs], dtype=np.float64)
+
+        mask = np.isnan(values)
+        if null_below is not None:
+            mask |= values < null_below
+
+        return cls(timestamps.astype("datetime64[ms]"), np.ma.MaskedArray(values, mask=mask), name=name)
+
+
+    @classmethod
+    def from_response(cls, metric, data):
+        """
+        Build the 'metric' series (one of SERIES) from the decoded response of its daily getter
+        """
+
+        if metric not in SERIES:
+            raise ValueError(f"Unexpected value {metric} for metric, expected one of {tuple(SERIES)}.")
+
+        _, key, value_index, null_below = SERIES[metric]
+
+        return cls.from_pairs((data or {}).get(key), name=metric, value_index=value_index, null_below=null_below)
+
+
+    @classmethod
+    def concat(cls, series, name=None):
+        """
+        Join series end to end (e.g. one per day) into one, sorted by timestamp
+        """
+
+        np = import_numpy("TimeSeries")
+
+        series = list(series)
+        if name is None and series:
+            name = series[0].name
+        if not series:
+            return cls(np.empty(0, dtype="datetime64[ms]"), np.empty(0), name=name)
+
+        timestamps = np.concatenate([part.timestamps for part in series])
+        values = np.ma.concatenate([part.values for part in series])
+        if len(timestamps) > 1 and (timestamps[1:] < timestamps[:-1]).any():
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, values = timestamps[order], values[order]
+
+        return cls(timestamps, values, name=name)
+
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+    def __repr__(self):
+        return f"TimeSeries(name={self.name!r}, samples={len(self)}, valid={self.values.count()})"
+
+
+    def __iter__(self):
+        """
+        Yield (datetime64, value or None) pairs
+        """
+
+        for timestamp, value in zip(self.timestamps, self.values.filled(float("nan")).tolist()):
+            yield timestamp, None if value != value else value
+
+
+    def dropna(self):
+        """
+        Return the series without its masked samples
+        """
+
+        np = import_numpy("TimeSeries")
+
+        valid = ~np.ma.getmaskarray(self.values)
+
+        return TimeSeries(self.timestamps[valid], self.values[valid], name=self.name)
+
+
+    def resample(self, seconds, how="mean", offset=0):
+        """
+        Aggregate the valid samples into bins of 'seconds' with 'how' (one of AGGREGATES).
+        Bins start at multiples of 'seconds' shifted by 'offset' seconds east of UTC, so
+        offset=3600 aligns days on UTC+1 midnight. Bins without samples are masked.
+        """
+
+        np = import_numpy("TimeSeries")
+
+        if how not in AGGREGATES:
+            raise ValueError(f"Unexpected value {how} for how, expected one of {AGGREGATES}.")
+        if seconds <= 0:
+            raise ValueError(f"Unexpected value {seconds} for seconds.")
+
+        step = int(seconds * 1000)
+        shift = int(offset * 1000)
+
+        valid = ~np.ma.getmaskarray(self.values)
+        millis = self.timestamps.astype(np.int64)[valid] + shift
+        values = self.values.data[valid].astype(np.float64)
+        if len(millis) == 0:
+            return TimeSeries(np.empty(0, dtype="datetime64[ms]"), np.empty(0), name=self.name)
+
+        bins = millis // step
+        first = bins.min()
+        bins -= first
+        size = int(bins.max()) + 1
+
+        counts = np.bincount(bins, minlength=size)
+        if how == "count":
+            result = counts.astype(np.float64)
+        elif how in ("mean", "sum"):
+            result = np.bincount(bins, weights=values, minlength=size)
+            if how == "mean":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result = result / counts
+        else:
+            ufunc = np.minimum if how == "min" else np.maximum
+            result = np.full(size, np.inf if how == "min" else -np.inf)
+            ufunc.at(result, bins, values)
+
+        empty = counts == 0 if how != "count" else np.zeros(size, dtype=bool)
+        starts = (np.arange(size, dtype=np.int64) + first) * step - shift
+
+        return TimeSeries(starts.astype("datetime64[ms]"), np.ma.MaskedArray(result, mask=empty), name=self.name)
+
+
+    def daily(self, how="mean", offset=0):
+        """
+        Aggregate per day, see resample()
+        """
+
+        return self.resample(DAY_SECONDS, how=how, offset=offset)
+
+
+    def to_arrow(self):
+        """
+        Return a pyarrow.Table with 'timestamp' and value columns, masked samples as nulls
+        """
+
+        try:
+            import pyarrow
+        except ImportError as err:
+            raise ImportError("TimeSeries.to_arrow requires the 'pyarrow' package.") from err
+
+        np = import_numpy("TimeSeries")
+
+        return pyarrow.table({
+            "timestamp": pyarrow.array(self.timestamps, type=pyarrow.timestamp("ms", tz="UTC")),
+            self.name or "value": pyarrow.array(self.values.data, mask=np.ma.getmaskarray(self.values)),
+        })
+
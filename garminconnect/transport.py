@@ -0,0 +1,292 @@
+"""
+Pluggable HTTP transports for ApiClient, including cassette record/replay
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import mmap
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+from .cache import CachedResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+CASSETTE_MAGIC = b"GCCASSETTE1\n"
+# Trailer: index offset, index length, magic
+TRAILER = struct.Struct("<QQ12s")
+
+# Never written to a cassette
+PRIVATE_HEADERS = {"set-cookie", "cookie", "authorization"}
+
+# Compressed streamed bodies being recorded are kept in memory up to this size, then spooled to disk
+SPOOL_SIZE = 1024 * 1024
+
+
+class TransportError(Exception):
+    """
+    Raised by a transport which could not produce a response
+    """
+
+
+class CassetteMissError(TransportError):
+    """
+    Raised on replay when the cassette holds no response for a request
+    """
+
+
+def request_key(method, url, params=None, data=None):
+    """
+    Identify a request by method, URL, sorted params and a digest of its body
+    """
+
+    params = sorted((str(name), str(value)) for name, value in (params or {}).items())
+    if data is None:
+        body = None
+    else:
+        raw = data if isinstance(data, bytes) else json.dumps(data, sort_keys=True, default=str).encode()
+        body = hashlib.sha1(raw).hexdigest()
+
+    return json.dumps([method.upper(), url, params, body])
+
+
+def with_session(transport, session):
+    """
+    Return 'transport' sending through the requests 'session' instead, for the login flow which
+    runs on a separate cookie jar (see ApiClient.login_client()). Transports without a
+    with_session() method, such as ReplayTransport, are returned as they are.
+    """
+
+    method = getattr(transport, "with_session", None)
+    if method is None:
+        return transport
+
+    return method(session)
+
+
+class SessionTransport:
+    """
+    Send requests with a requests session, the default behaviour of ApiClient
+    """
+
+    def __init__(self, session):
+        """
+        """
+
+        self.session = session
+
+
+    def request(self, method, url, headers=None, params=None, data=None, stream=False):
+        """
+        """
+
+        return self.session.request(method, url, headers=headers, params=params, data=data, stream=stream)
+
+
+    def with_session(self, session):
+        """
+        """
+
+        return SessionTransport(session)
+
+
+    def close(self):
+        """
+        """
+
+
+class RecordingTransport:
+    """
+    Forward requests to 'inner' and append every response to a compressed cassette at 'path'.
+
+    Each record is compressed on its own and located through an index written by close(),
+    so ReplayTransport can serve single responses straight from a memory map. Cookies and
+    authorization headers are not recorded; POST bodies (credentials) are only kept as a digest.
+    Streamed bodies are compressed as the caller reads them through iter_content() (as
+    ApiClient downloads do) and recorded once read to the end; a body left unread is not recorded.
+    """
+
+    def __init__(self, inner, path):
+        """
+        """
+
+        self.inner = inner
+        self.path = path
+        self.index = {}
+
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        self._file.write(CASSETTE_MAGIC)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def request(self, method, url, headers=None, params=None, data=None, stream=False):
+        """
+        """
+
+        start = time.perf_counter()
+        response = self.inner.request(method, url, headers=headers, params=params, data=data, stream=stream)
+        key = request_key(method, url, params, data)
+        if stream:
+            response.iter_content = self._recording_iter_content(key, response, time.perf_counter() - start)
+            return response
+
+        body = response.content
+        record = zlib.compress(self._meta(response, time.perf_counter() - start) + b"\0" + body)
+
+        with self._lock:
+            offset = self._file.tell()
+            self._file.write(record)
+            self.index.setdefault(key, []).append([offset, len(record)])
+
+        return response
+
+
+    @staticmethod
+    def _meta(response, elapsed):
+        return json.dumps({
+            "status": response.status_code,
+            "reason": response.reason,
+            "url": response.url,
+            "headers": {name: value for name, value in response.headers.items() if name.lower() not in PRIVATE_HEADERS},
+            "elapsed": elapsed,
+        }).encode()
+
+
+    def _recording_iter_content(self, key, response, elapsed):
+        # requests' own content property reads through iter_content() too
+        iter_content = response.iter_content
+
+        def recording_iter_content(chunk_size=1, decode_unicode=False):
+            compressor = zlib.compressobj()
+            with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as spool:
+                spool.write(compressor.compress(self._meta(response, elapsed) + b"\0"))
+                for chunk in iter_content(chunk_size, decode_unicode):
+                    data = chunk.encode(response.encoding or "utf-8") if isinstance(chunk, str) else chunk
+                    spool.write(compressor.compress(data))
+                    yield chunk
+                spool.write(compressor.flush())
+
+                with self._lock:
+                    if self._file.closed:
+                        return
+                    offset = self._file.tell()
+                    spool.seek(0)
+                    shutil.copyfileobj(spool, self._file)
+                    self.index.setdefault(key, []).append([offset, self._file.tell() - offset])
+
+        return recording_iter_content
+
+
+    def with_session(self, session):
+        """
+        Return a transport recording into the same cassette while 'inner' sends through 'session'
+        """
+
+        transport = copy.copy(self)
+        transport.inner = with_session(self.inner, session)
+
+        return transport
+
+
+    def close(self):
+        """
+        Write the index; the cassette is only replayable once closed
+        """
+
+        with self._lock:
+            if self._file.closed:
+                return
+            index = zlib.compress(json.dumps(self.index).encode())
+            offset = self._file.tell()
+            self._file.write(index)
+            self._file.write(TRAILER.pack(offset, len(index), CASSETTE_MAGIC))
+            self._file.close()
+
+        self.inner.close()
+
+
+class ReplayTransport:
+    """
+    Serve responses recorded by RecordingTransport without any network access.
+
+    Repeated requests get the recorded responses in order, wrapping around once exhausted.
+    With 'speed' each response is delayed by its recorded latency divided by 'speed'
+    (e.g. 100 replays a traffic shape 100 times faster); by default there is no delay.
+    """
+
+    def __init__(self, path, speed=None):
+        """
+        """
+
+        self.path = path
+        self.speed = speed
+
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(CASSETTE_MAGIC)] != CASSETTE_MAGIC:
+            raise TransportError(f"{path} is not a cassette.")
+
+        offset, length, magic = TRAILER.unpack_from(self._map, len(self._map) - TRAILER.size)
+        if magic != CASSETTE_MAGIC:
+            raise TransportError(f"{path} is incomplete, the recording was not closed.")
+        self.index = json.loads(zlib.decompress(self._map[offset:offset + length]))
+
+        self._positions = {}
+        self._lock = threading.Lock()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def request(self, method, url, headers=None, params=None, data=None, stream=False):
+        """
+        """
+
+        key = request_key(method, url, params, data)
+        records = self.index.get(key)
+        if not records:
+            raise CassetteMissError(f"No recorded response for {method} {url} {params}")
+
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        offset, length = records[position % len(records)]
+
+        raw = zlib.decompress(self._map[offset:offset + length])
+        meta, body = raw.split(b"\0", 1)
+        meta = json.loads(meta)
+
+        if self.speed:
+            time.sleep(meta["elapsed"] / self.speed)
+
+        return CachedResponse(body, status_code=meta["status"], headers=meta["headers"], url=meta["url"],
+                              reason=meta["reason"])
+
+
+    def close(self):
+        """
+        """
+
+        self._map.close()
+        self._file.close()
@@ -0,0 +1,174 @@
+"""
+Incremental TCX/GPX track parser producing the same columns as garminconnect.fit
+
+    track = xmltrack.read_track(garmin.download_activity(activity_id, Garmin.ActivityDownloadFormat.TCX))
+    for result in xmltrack.iter_tracks(glob.glob("exports/*.gpx"), max_workers=8):
+        ...
+
+Documents are parsed incrementally in chunks and every trackpoint is cleared and detached
+as soon as its values are appended to typed arrays, so memory stays flat apart from the
+output columns however long the activity is.
+"""
+
+import datetime
+
+from array import array
+from collections import namedtuple
+from xml.etree import ElementTree
+
+from .fit import COLUMNS
+from .support import import_numpy, open_source
+
+
+TrackResult = namedtuple("TrackResult", "source track error")
+
+POINT_TAGS = {"Trackpoint", "trkpt"}
+# Parents of trackpoints
+CONTAINER_TAGS = {"Track", "trkseg"}
+
+# local element name inside a trackpoint: column (TCX, GPX and their Garmin extensions)
+POINT_FIELDS = {
+    "LatitudeDegrees": "position_lat",
+    "LongitudeDegrees": "position_long",
+    "AltitudeMeters": "altitude",
+    "ele": "altitude",
+    "DistanceMeters": "distance",
+    "Value": "heart_rate",
+    "hr": "heart_rate",
+    "Cadence": "cadence",
+    "RunCadence": "cadence",
+    "cad": "cadence",
+    "Speed": "speed",
+    "speed": "speed",
+    "Watts": "power",
+    "power": "power",
+    "PowerInWatts": "power",
+}
+
+TIME_TAGS = {"Time", "time"}
+
+CHUNK_SIZE = 64 * 1024
+
+VALUE_COLUMNS = tuple(name for name in COLUMNS if name != "timestamp")
+LAT_INDEX = VALUE_COLUMNS.index("position_lat")
+LON_INDEX = VALUE_COLUMNS.index("position_long")
+
+NAN = float("nan")
+
+
+def _timestamps(np, times):
+    """
+    Convert ISO 8601 strings to datetime64[ms] (UTC), vectorized unless some carry a UTC offset
+    """
+
+    stripped = [value[:-1] if value.endswith("Z") else value for value in times]
+    if not any("+" in value or value.count("-") > 2 for value in stripped):
+        return np.array([value or "NaT" for value in stripped], dtype="datetime64[ms]")
+
+    converted = []
+    for value in times:
+        if not value:
+            converted.append("NaT")
+            continue
+        moment = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        converted.append(moment.isoformat())
+
+    return np.array(converted, dtype="datetime64[ms]")
+
+
+def read_track(source, chunk_size=CHUNK_SIZE):
+    """
+    Parse the trackpoints of a TCX or GPX document given as bytes, a path or a binary file
+    object, or of the first .tcx/.gpx file in a zip archive (see support.open_source()), into
+    {column: NumPy array} with the columns of garminconnect.fit.COLUMNS. 'timestamp' is
+    datetime64[ms] (UTC); missing values are NaN (NaT for timestamps).
+    """
+
+    np = import_numpy("The TCX/GPX parser")
+
+    values = {name: array("d") for name in VALUE_COLUMNS}
+    appenders = [values[name].append for name in VALUE_COLUMNS]
+    fields = {name: VALUE_COLUMNS.index(column) for name, column in POINT_FIELDS.items()}
+    times = []
+    names = {}
+    container = None
+
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    with open_source(source, (".tcx", ".gpx")) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                name = names.get(element.tag)
+                if name is None:
+                    name = names[element.tag] = element.tag.rpartition("}")[2]
+
+                if event == "start":
+                    if name in CONTAINER_TAGS:
+                        container = element
+                    continue
+                if name not in POINT_TAGS:
+                    continue
+
+                point = [NAN] * len(VALUE_COLUMNS)
+                if "lat" in element.attrib:
+                    point[LAT_INDEX] = float(element.attrib["lat"])
+                    point[LON_INDEX] = float(element.attrib["lon"])
+                time = ""
+                for child in element.iter():
+                    child_name = names.get(child.tag)
+                    if child_name is None:
+                        child_name = names[child.tag] = child.tag.rpartition("}")[2]
+                    index = fields.get(child_name)
+                    if index is not None:
+                        if child.text and not child.text.isspace():
+                            point[index] = float(child.text)
+                    elif child_name in TIME_TAGS and child.text:
+                        time = child.text.strip()
+
+                times.append(time)
+                for append, value in zip(appenders, point):
+                    append(value)
+
+                # Detach the trackpoint so the tree never holds more than one
+                element.clear()
+                if container is not None:
+                    container.remove(element)
+        parser.close()
+
+    track = {"timestamp": _timestamps(np, times)}
+    track.update((name, np.frombuffer(column, dtype=np.float64)) for name, column in values.items())
+
+    return track
+
+
+def _read_result(source):
+    try:
+        return TrackResult(source, read_track(source), None)
+    except Exception as err:
+        return TrackResult(source, None, err)
+
+
+def iter_tracks(sources, max_workers=1, chunksize=16):
+    """
+    Parse many TCX/GPX documents, yielding TrackResult(source, track, error) in order; a file
+    which fails to parse carries its exception in 'error'. With 'max_workers' above 1 the
+    files are parsed in that many processes, so 'sources' must then be paths or bytes.
+    """
+
+    if max_workers < 1:
+        raise ValueError(f"Unexpected value {max_workers} for max_workers.")
+
+    if max_workers == 1:
+        for source in sources:
+            yield _read_result(source)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(_read_result, sources, chunksize=chunksize)